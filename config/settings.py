@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,6 +34,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.cart_storage.CartStorageMiddleware',
+    'core.request_currency.CurrencyMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -51,6 +54,10 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.views.currency_context',
             ],
+            # Le dossier core/template_tags n'est pas découvert automatiquement
+            'libraries': {
+                'currency_tags': 'core.template_tags.currency_tags',
+            },
         },
     },
 ]
@@ -109,16 +116,41 @@ DEFAULT_FROM_EMAIL = 'Projet Obidon <yavinmitekor@gmail.com>'
 CURRENCY_SETTINGS = {
     'DEFAULT_CURRENCY': 'XOF',  # Devise par défaut
     'SUPPORTED_CURRENCIES': ['XOF', 'USD', 'EUR'],
+    'PIVOT_CURRENCY': 'EUR',  # Seule devise demandée à l'API, les taux croisés en sont dérivés
     'EXCHANGE_RATE_API_URL': 'https://api.exchangerate-api.com/v4/latest/',
+    'API_CONNECT_TIMEOUT': 3.05,  # Secondes pour établir la connexion à l'API
+    'API_READ_TIMEOUT': 5,  # Secondes pour recevoir la réponse
+    'BREAKER_FAILURES': 3,  # Échecs consécutifs avant d'ouvrir le disjoncteur
+    'BREAKER_RESET': 60,  # Secondes avant un nouvel essai
     'CACHE_TIMEOUT': 3600,  # Cache des taux de change pendant 1 heure
     'AUTO_UPDATE_RATES': True,  # Mise à jour automatique des taux
 }
 
-# Cache configuration (si vous n'en avez pas déjà)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 3600,
+# Cache partagé par tous les processus (workers web, run_jobs) : les
+# invalidations du catalogue (core/cache_tags.py) et les verrous single-flight
+# en dépendent. Sans REDIS_URL, cache en mémoire propre à chaque processus
+# (développement, un seul processus).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 3600,
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 3600,
+        }
+    }
+
+# Stockage du panier : 'session', 'signed_cookie' ou 'cache' (voir core/cart_storage.py)
+CART_STORAGE = 'signed_cookie'
+CART_WRITE_BEHIND_INTERVAL = 30  # secondes entre deux copies en base (stockage 'cache')
+
+# Numéros de commande réservés par bloc et par processus (voir core/order_numbers.py)
+ORDER_NUMBER_BLOCK_SIZE = 50
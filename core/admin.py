@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, Order, OrderItem, Review
+from .models import Category, Product, ProductImage, Order, OrderItem, Review, Job
 
 
 @admin.register(Category)
@@ -281,4 +281,12 @@ class ReviewAdmin(admin.ModelAdmin):
             '<span style="background-color:{}; color:white; padding:3px 8px; border-radius:3px;">{}</span>',
             color, label
         )
-    verified_badge.short_description = 'Statut'
\ No newline at end of file
+    verified_badge.short_description = 'Statut'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'priority', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'dedupe_key']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
@@ -0,0 +1,105 @@
+# cache_tags.py - Cache par étiquettes avec invalidation par compteurs de version
+
+"""
+Chaque valeur mise en cache est associée à des étiquettes (`catalog`,
+`product:<id>`, `category:<id>`, `reviews:<product_id>`). Chaque étiquette a
+un compteur de version stocké dans le cache ; la clé réelle d'une valeur
+contient les versions de ses étiquettes au moment du calcul.
+
+Invalider une étiquette revient à incrémenter son compteur (O(1)) : toutes
+les clés qui en dépendent deviennent inaccessibles et expirent d'elles-mêmes.
+L'incrément a lieu après la validation de la transaction de l'écrivain : un
+lecteur concurrent ne peut pas ranger des données non validées sous la
+nouvelle version.
+
+Les compteurs ne sont partagés entre processus (workers web, `run_jobs`) que
+si le cache l'est : REDIS_URL dans l'environnement (voir config/settings.py).
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_TIMEOUT = 600  # 10 minutes
+
+CATALOG = 'catalog'
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+def category_tag(category_id):
+    return f'category:{category_id}'
+
+
+def reviews_tag(product_id):
+    return f'reviews:{product_id}'
+
+
+def _version_key(tag):
+    return f'tagver:{tag}'
+
+
+def _initial_version():
+    # Un compteur évincé repart d'une valeur jamais utilisée (horodatage en ms),
+    # pour ne pas réactiver d'anciennes valeurs encore présentes dans le cache
+    return int(time.time() * 1000)
+
+
+def tag_versions(tags):
+    """Versions courantes d'un ensemble d'étiquettes"""
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys.keys())
+    versions = {}
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            # add() ne remplace pas un compteur créé entre-temps par un autre processus
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key) or _initial_version()
+        versions[tag] = version
+    return versions
+
+
+def bump(*tags):
+    """
+    Invalide toutes les valeurs associées à ces étiquettes, à la validation
+    de la transaction en cours (immédiatement hors transaction)
+    """
+    tags = set(tags)
+    transaction.on_commit(lambda: _increment(tags))
+
+
+def _increment(tags):
+    for tag in tags:
+        key = _version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Compteur absent (jamais lu ou évincé)
+            cache.add(key, _initial_version(), None)
+
+
+def tagged_key(key, tags):
+    """Clé de cache incluant la version courante de chaque étiquette"""
+    versions = tag_versions(tags)
+    signature = ','.join(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    digest = hashlib.sha1(signature.encode()).hexdigest()[:16]
+    return f'tagged:{key}:{digest}'
+
+
+def get_or_set(key, tags, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Retourne la valeur en cache ou la calcule avec compute().
+    Les versions sont lues avant le calcul : si une étiquette est invalidée
+    pendant celui-ci, la valeur est rangée sous une clé déjà périmée.
+    """
+    full_key = tagged_key(key, tags)
+    value = cache.get(full_key)
+    if value is None:
+        value = compute()
+        cache.set(full_key, value, timeout)
+    return value
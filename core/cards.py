@@ -0,0 +1,126 @@
+# cards.py - Maintenance du modèle de lecture ProductCard
+
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils.text import Truncator
+
+from . import price_projection
+from .models import Product, ProductCard, Review
+
+LOW_STOCK_THRESHOLD = 5
+
+CARD_FIELDS = [
+    'slug', 'name', 'excerpt', 'category', 'category_name', 'product_type',
+    'price', 'effective_price', 'discount_percent', 'thumbnail_url',
+    'back_image_url', 'rating', 'reviews_count', 'in_stock', 'stock_badge',
+    'is_featured', 'created_at',
+]
+
+
+def stock_badge(product):
+    """Badge de stock affiché sur la carte"""
+    if not product.display_stock:
+        return 'hidden'
+    if product.stock <= 0:
+        return 'out_of_stock'
+    if product.stock <= LOW_STOCK_THRESHOLD:
+        return 'low_stock'
+    return 'in_stock'
+
+
+def build_card(product):
+    """Construit (sans l'enregistrer) la carte d'un produit"""
+    return ProductCard(
+        product_id=product.pk,
+        slug=product.slug,
+        name=product.name,
+        excerpt=Truncator(product.description).words(15)[:200],
+        category_id=product.category_id,
+        category_name=product.category.name,
+        product_type=product.product_type,
+        price=product.price,
+        effective_price=product.effective_price,
+        discount_percent=product.discount_percent,
+        thumbnail_url=product.get_image_url(),
+        back_image_url=product.get_back_image_url() or '',
+        rating=product.rating,
+        reviews_count=product.reviews_count,
+        in_stock=product.stock > 0,
+        stock_badge=stock_badge(product),
+        is_featured=product.is_featured,
+        created_at=product.created_at,
+    )
+
+
+def refresh_cards(product_ids):
+    """
+    Met à jour les cartes d'un ensemble de produits : upsert des produits
+    actifs, suppression des autres (inactifs ou supprimés)
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    products = list(Product.objects.filter(pk__in=product_ids).select_related('category'))
+    cards = [build_card(product) for product in products if product.is_active]
+    active_ids = {card.product_id for card in cards}
+
+    with transaction.atomic():
+        ProductCard.objects.filter(pk__in=product_ids - active_ids).delete()
+        ProductCard.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=CARD_FIELDS,
+        )
+        price_projection.refresh_prices(active_ids)
+
+
+def refresh_stock(product_ids):
+    """
+    Met à jour les badges de stock des cartes après une variation de stock,
+    retourne True si un badge affiché a changé
+    """
+    cards = ProductCard.objects.in_bulk(product_ids)
+    changed = []
+    for product in Product.objects.filter(pk__in=cards).only('pk', 'stock', 'display_stock'):
+        card = cards[product.pk]
+        badge, in_stock = stock_badge(product), product.stock > 0
+        if (card.stock_badge, card.in_stock) != (badge, in_stock):
+            card.stock_badge, card.in_stock = badge, in_stock
+            changed.append(card)
+    ProductCard.objects.bulk_update(changed, ['stock_badge', 'in_stock'])
+    return bool(changed)
+
+
+def refresh_category(category):
+    """Propage un renommage de catégorie sur ses cartes"""
+    ProductCard.objects.filter(category=category).update(category_name=category.name)
+
+
+def refresh_product_rating(product_id):
+    """Recalcule note moyenne et nombre d'avis d'un produit depuis ses avis"""
+    stats = Review.objects.filter(product_id=product_id).aggregate(
+        average=Avg('rating'), count=Count('pk')
+    )
+    rating = round(stats['average'] or 0, 1)
+    Product.objects.filter(pk=product_id).update(rating=rating, reviews_count=stats['count'])
+
+
+def rebuild_cards(batch_size=500):
+    """Reconstruit tout le modèle de lecture, retourne le nombre de cartes"""
+    count = 0
+    with transaction.atomic():
+        ProductCard.objects.all().delete()
+        batch = []
+        products = Product.objects.filter(is_active=True).select_related('category')
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(build_card(product))
+            if len(batch) >= batch_size:
+                ProductCard.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        ProductCard.objects.bulk_create(batch)
+        count += len(batch)
+        # Les prix par devise ont été supprimés avec les cartes
+        price_projection.rebuild_prices()
+    return count
@@ -0,0 +1,194 @@
+# cart.py - Calcul des prix du panier (panier, checkout, paiement)
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from .cart_storage import load_cart, save_cart
+from .models import Product
+
+# Frais de livraison par mode
+SHIPPING_COSTS = {
+    'standard': Decimal('0'),
+    'express': Decimal('9.99'),
+    'overnight': Decimal('19.99'),
+}
+DEFAULT_SHIPPING = 'standard'
+
+TAX_RATE = Decimal('0.20')
+
+CENT = Decimal('0.01')
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+MAX_QUANTITY = 999
+
+
+class CartError(ValueError):
+    """Opérations de panier invalides ; `errors` détaille chaque opération rejetée"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Opérations de panier invalides')
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """Une ligne de panier au prix effectif (remise appliquée)"""
+    product: Product
+    quantity: int
+    unit_price: Decimal
+
+    @property
+    def total(self):
+        return self.unit_price * self.quantity
+
+
+@dataclass(frozen=True)
+class PricedCart:
+    """Panier valorisé, immuable : lignes, sous-total, livraison, taxe et total"""
+    lines: tuple
+    shipping_method: str
+    subtotal: Decimal
+    shipping_cost: Decimal
+    tax: Decimal
+    total: Decimal
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def is_empty(self):
+        return not self.lines
+
+    @property
+    def item_count(self):
+        return sum(line.quantity for line in self.lines)
+
+
+def _parse_items(cart_items):
+    """{product_id: quantité} du panier en session, entrées invalides ignorées"""
+    items = {}
+    for product_id, quantity in cart_items.items():
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            items[product_id] = quantity
+    return items
+
+
+def price_cart(cart_items, shipping_method=DEFAULT_SHIPPING):
+    """
+    Valorise un panier {product_id: quantité} en une seule requête.
+    Les produits supprimés ou inactifs sont ignorés.
+    """
+    items = _parse_items(cart_items)
+    products = (
+        Product.objects.filter(is_active=True).select_related('category').in_bulk(items.keys())
+        if items else {}
+    )
+    lines = tuple(
+        CartLine(product=products[product_id], quantity=quantity,
+                 unit_price=products[product_id].effective_price)
+        for product_id, quantity in items.items() if product_id in products
+    )
+
+    if shipping_method not in SHIPPING_COSTS:
+        shipping_method = DEFAULT_SHIPPING
+    subtotal = sum((line.total for line in lines), Decimal('0'))
+    shipping_cost = SHIPPING_COSTS[shipping_method] if lines else Decimal('0')
+    tax = (subtotal * TAX_RATE).quantize(CENT)
+    return PricedCart(
+        lines=lines,
+        shipping_method=shipping_method,
+        subtotal=subtotal,
+        shipping_cost=shipping_cost,
+        tax=tax,
+        total=(subtotal + shipping_cost + tax).quantize(CENT),
+    )
+
+
+def _memo_key(cart_items, shipping_method):
+    return (shipping_method, tuple(sorted((str(k), v) for k, v in cart_items.items())))
+
+
+def get_priced_cart(request, shipping_method=DEFAULT_SHIPPING):
+    """
+    Panier de la requête valorisé, mémorisé pour le reste de la requête
+    (recalculé seulement si le contenu du panier change entre-temps)
+    """
+    cart_items = load_cart(request)
+    key = _memo_key(cart_items, shipping_method)
+    memo = request.__dict__.setdefault('_priced_carts', {})
+    if key not in memo:
+        memo[key] = price_cart(cart_items, shipping_method)
+    return memo[key]
+
+
+def _memoize(request, cart_items, shipping_method, cart):
+    request.__dict__.setdefault('_priced_carts', {})[_memo_key(cart_items, shipping_method)] = cart
+
+
+def apply_operations(cart_items, operations):
+    """
+    Applique une liste d'opérations {'op': add|set|remove, 'product_id', 'quantity'}
+    à une copie du panier. Toutes les opérations sont validées avant d'être
+    appliquées : en cas d'erreur, CartError est levée et rien n'est modifié.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise CartError([{'index': None, 'message': 'Aucune opération'}])
+
+    cart = _parse_items(cart_items)
+    errors = []
+    for index, operation in enumerate(operations):
+        try:
+            op = operation['op']
+            product_id = int(operation['product_id'])
+            quantity = int(operation.get('quantity', 1 if op == 'add' else 0))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            errors.append({'index': index, 'message': 'Opération mal formée'})
+            continue
+        if op not in CART_OPERATIONS:
+            errors.append({'index': index, 'message': f'Opération inconnue : {op}'})
+        elif op == 'remove':
+            cart.pop(product_id, None)
+        elif quantity < 0 or (op == 'add' and quantity == 0):
+            errors.append({'index': index, 'message': 'Quantité invalide'})
+        else:
+            quantity += cart.get(product_id, 0) if op == 'add' else 0
+            if quantity:
+                cart[product_id] = min(quantity, MAX_QUANTITY)
+            else:
+                cart.pop(product_id, None)
+    if errors:
+        raise CartError(errors)
+    return cart
+
+
+def mutate_cart(request, operations, shipping_method=DEFAULT_SHIPPING):
+    """
+    Applique un lot d'opérations au panier : les produits sont validés par
+    la valorisation du nouveau panier (une seule requête) et le panier n'est
+    écrit qu'une fois, seulement si tout le lot est valide.
+    Retourne le PricedCart résultant.
+    """
+    items = apply_operations(load_cart(request), operations)
+    cart = price_cart(items, shipping_method)
+
+    priced_ids = {line.product.pk for line in cart.lines}
+    errors = [
+        {'index': index, 'message': 'Produit non trouvé'}
+        for index, operation in enumerate(operations)
+        if operation['op'] != 'remove' and int(operation['product_id']) not in priced_ids
+        and int(operation['product_id']) in items
+    ]
+    if errors:
+        raise CartError(errors)
+
+    cart_items = {str(line.product.pk): line.quantity for line in cart.lines}
+    save_cart(request, cart_items)
+    _memoize(request, cart_items, shipping_method, cart)
+    return cart
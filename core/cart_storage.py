@@ -0,0 +1,279 @@
+# cart_storage.py - Stockage du panier (session, cookie signé ou cache)
+
+"""
+Le contenu du panier ({product_id: quantité}) est lu et écrit via un
+« store » choisi par le réglage CART_STORAGE :
+
+- 'session'       : la session Django (une écriture django_session par modification)
+- 'signed_cookie' : un cookie signé, aucune écriture côté serveur ; un panier
+                    trop gros pour un cookie (COOKIE_MAX_BYTES) reste en session
+- 'cache'         : le cache, avec copie différée dans la table StoredCart
+                    au plus une fois par CART_WRITE_BEHIND_INTERVAL secondes
+
+Les vues passent par load_cart() / save_cart() ; CartStorageMiddleware pose
+les cookies éventuels sur la réponse (ou la vue elle-même via finalize_cart(),
+pour qu'une réponse rejouée par idempotency.py les contienne).
+
+Un panier resté en session (CART_STORAGE précédent) est repris une fois par
+les autres stores, puis retiré de la session.
+"""
+
+import json
+import logging
+import time
+import uuid
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .models import StoredCart
+
+logger = logging.getLogger(__name__)
+
+CART_COOKIE = 'cart'
+SESSION_KEY = 'cart'
+CART_ID_COOKIE = 'cart_id'
+COOKIE_SALT = 'core.cart'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # 30 jours
+# Les navigateurs ignorent un cookie de plus de 4096 octets (nom, valeur et
+# attributs) : marge pour les attributs (Max-Age, Path, SameSite...)
+COOKIE_MAX_BYTES = 3900
+CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 jours
+
+
+def _clean(items):
+    """Panier normalisé {str(product_id): quantité}"""
+    cart = {}
+    if isinstance(items, dict):
+        for product_id, quantity in items.items():
+            try:
+                cart[str(int(product_id))] = int(quantity)
+            except (TypeError, ValueError):
+                continue
+    return cart
+
+
+class BaseCartStore:
+    """API commune : load() / save(items) / clear() / finalize(response)"""
+
+    def __init__(self, request):
+        self.request = request
+        self._items = None
+        self.finalized = False
+
+    def load(self):
+        if self._items is None:
+            self._items = _clean(self.read())
+            if not self._items:
+                self._take_session_cart()
+        return dict(self._items)
+
+    def _take_session_cart(self):
+        """Reprend le panier enregistré en session avant le changement de stockage"""
+        session = getattr(self.request, 'session', None)
+        if session is not None and SESSION_KEY in session:
+            self.save(session.pop(SESSION_KEY))
+
+    def save(self, items):
+        self._items = _clean(items)
+        self.write(self._items)
+
+    def clear(self):
+        self.save({})
+
+    def read(self):
+        raise NotImplementedError
+
+    def write(self, items):
+        raise NotImplementedError
+
+    def finalize(self, response):
+        """Appelé par le middleware avant l'envoi de la réponse"""
+
+
+class SessionCartStore(BaseCartStore):
+    """Comportement historique : panier dans la session"""
+
+    def read(self):
+        return self.request.session.get(SESSION_KEY, {})
+
+    def write(self, items):
+        self.request.session[SESSION_KEY] = items
+        self.request.session.modified = True
+
+    def _take_session_cart(self):
+        pass
+
+
+class SignedCookieCartStore(BaseCartStore):
+    """
+    Panier dans un cookie signé (infalsifiable). Au-delà de COOKIE_MAX_BYTES
+    le navigateur l'ignorerait sans erreur : le panier est alors gardé en
+    session, et revient dans le cookie dès qu'il y tient de nouveau.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self._dirty = False
+        self._in_session = False
+
+    def read(self):
+        raw = self.request.get_signed_cookie(CART_COOKIE, default=None, salt=COOKIE_SALT)
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return {}
+
+    def _take_session_cart(self):
+        items = _clean(self.request.session.get(SESSION_KEY))
+        if not items:
+            return
+        if _fits_in_cookie(items):
+            super()._take_session_cart()
+        else:
+            # Trop gros pour le cookie : il reste en session, sans réécriture
+            self._items = items
+            self._in_session = True
+
+    def write(self, items):
+        self._dirty = True
+        session = self.request.session
+        self._in_session = bool(items) and not _fits_in_cookie(items)
+        if self._in_session:
+            logger.info("Panier trop volumineux pour un cookie (%s lignes), gardé en session", len(items))
+            session[SESSION_KEY] = items
+        elif SESSION_KEY in session:
+            del session[SESSION_KEY]
+
+    def finalize(self, response):
+        if not self._dirty:
+            return
+        if self._items and not self._in_session:
+            response.set_signed_cookie(
+                CART_COOKIE, _cookie_value(self._items), salt=COOKIE_SALT,
+                max_age=COOKIE_MAX_AGE, httponly=True, samesite='Lax',
+            )
+        else:
+            response.delete_cookie(CART_COOKIE, samesite='Lax')
+
+
+def _cookie_value(items):
+    return json.dumps(items, separators=(',', ':'))
+
+
+def _fits_in_cookie(items):
+    """Taille du cookie signé tel qu'envoyé (valeur échappée comprise)"""
+    signed = signing.get_cookie_signer(salt=CART_COOKIE + COOKIE_SALT).sign(_cookie_value(items))
+    cookie = SimpleCookie()
+    cookie[CART_COOKIE] = signed
+    return len(cookie[CART_COOKIE].OutputString()) <= COOKIE_MAX_BYTES
+
+
+class CacheCartStore(BaseCartStore):
+    """
+    Panier dans le cache, identifié par un cookie cart_id ;
+    la table StoredCart n'est écrite qu'après CART_WRITE_BEHIND_INTERVAL
+    secondes depuis la dernière copie, et sert de secours si le cache est vidé
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self._new_id = None
+        self._dirty = False
+
+    @property
+    def cart_id(self):
+        # Lié au navigateur comme la session : le panier survit à la connexion
+        cookie_id = self.request.COOKIES.get(CART_ID_COOKIE, '')
+        if len(cookie_id) == 32 and cookie_id.isalnum():
+            return cookie_id
+        if self._new_id is None:
+            self._new_id = uuid.uuid4().hex
+        return self._new_id
+
+    def _cache_key(self):
+        return f'cart:{self.cart_id}'
+
+    def read(self):
+        entry = cache.get(self._cache_key())
+        if entry is not None:
+            return entry['items']
+        stored = StoredCart.objects.filter(cart_id=self.cart_id).values_list('items', flat=True).first()
+        if stored is not None:
+            cache.set(self._cache_key(), {'items': stored, 'persisted_at': time.time()}, CACHE_TIMEOUT)
+        return stored or {}
+
+    def write(self, items):
+        key = self._cache_key()
+        entry = cache.get(key) or {'persisted_at': 0}
+        interval = getattr(settings, 'CART_WRITE_BEHIND_INTERVAL', 30)
+        if time.time() - entry['persisted_at'] >= interval and self._persist(items):
+            entry['persisted_at'] = time.time()
+        entry['items'] = items
+        cache.set(key, entry, CACHE_TIMEOUT)
+        self._dirty = True
+
+    def _persist(self, items):
+        """Copie en base ; un échec est réessayé à la prochaine écriture (le cache fait foi)"""
+        try:
+            # UPDATE d'abord : en autocommit, pas de transaction lecture puis écriture
+            if not StoredCart.objects.filter(cart_id=self.cart_id).update(items=items):
+                StoredCart.objects.create(cart_id=self.cart_id, items=items)
+        except DatabaseError as e:
+            logger.warning("Copie différée du panier %s impossible: %s", self.cart_id, e)
+            return False
+        return True
+
+    def finalize(self, response):
+        if self._new_id is not None and self._dirty:
+            response.set_cookie(CART_ID_COOKIE, self._new_id, max_age=COOKIE_MAX_AGE,
+                                httponly=True, samesite='Lax')
+
+
+CART_STORES = {
+    'session': SessionCartStore,
+    'signed_cookie': SignedCookieCartStore,
+    'cache': CacheCartStore,
+}
+
+
+def get_cart_store(request):
+    """Store du panier de la requête (créé une fois par requête)"""
+    store = getattr(request, '_cart_store', None)
+    if store is None:
+        store_class = CART_STORES[getattr(settings, 'CART_STORAGE', 'session')]
+        store = request._cart_store = store_class(request)
+    return store
+
+
+def load_cart(request):
+    return get_cart_store(request).load()
+
+
+def save_cart(request, items):
+    get_cart_store(request).save(items)
+
+
+def finalize_cart(request, response):
+    """Pose les cookies du panier sur la réponse, une seule fois par requête"""
+    store = getattr(request, '_cart_store', None)
+    if store is not None and not store.finalized:
+        store.finalize(response)
+        store.finalized = True
+
+
+class CartStorageMiddleware:
+    """Pose les cookies du store de panier (cookie signé, identifiant de panier)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        finalize_cart(request, response)
+        return response
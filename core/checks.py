@@ -0,0 +1,18 @@
+# checks.py - Vérifications de configuration (manage.py check)
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Les invalidations passent par le cache : il doit être partagé en production"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('.LocMemCache'):
+        return [Warning(
+            "Le cache par défaut est local au processus : les invalidations du catalogue "
+            "ne sont pas vues par les autres workers ni par run_jobs.",
+            hint="Définir REDIS_URL (cache Redis partagé).",
+            id='core.W001',
+        )]
+    return []
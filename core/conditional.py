@@ -0,0 +1,128 @@
+# conditional.py - GET conditionnels (ETag / Last-Modified) des pages catalogue
+
+"""
+La date de dernière modification d'une page est le max(updated_at) des objets
+affichés ; elle est mise en cache sous les mêmes étiquettes que la page
+(cache_tags), donc recalculée seulement après une modification.
+
+L'ETag combine cette date, les versions des étiquettes (qui changent aussi
+lors des suppressions, invisibles dans max(updated_at)), l'utilisateur
+connecté, dont le nom apparaît dans la barre de navigation, et la devise
+d'affichage des prix.
+"""
+
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.db.models import Max
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import cache_tags, exchange_rates
+from .models import Category, Product, Review
+from .request_currency import get_request_currency
+
+# Date utilisée quand aucun objet n'existe encore
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+LAST_MODIFIED_TIMEOUT = 3600  # 1 heure (invalidé par étiquettes)
+
+
+def _latest(*dates):
+    return max((date for date in dates if date is not None), default=EPOCH)
+
+
+def catalog_last_modified():
+    """Dernière modification d'un produit ou d'une catégorie"""
+    def compute():
+        return _latest(
+            Product.objects.aggregate(latest=Max('updated_at'))['latest'],
+            Category.objects.aggregate(latest=Max('updated_at'))['latest'],
+        )
+    return cache_tags.get_or_set('catalog_last_modified', [cache_tags.CATALOG],
+                                 compute, LAST_MODIFIED_TIMEOUT)
+
+
+def product_last_modified(product_id):
+    """Dernière modification d'un produit, de sa catégorie ou de ses avis"""
+    def compute():
+        row = (Product.objects.filter(pk=product_id)
+               .values_list('updated_at', 'category__updated_at').first())
+        if row is None:
+            return None
+        reviews = Review.objects.filter(product_id=product_id).aggregate(latest=Max('updated_at'))
+        return _latest(*row, reviews['latest'])
+    return cache_tags.get_or_set(f'product_last_modified_{product_id}',
+                                 product_tags(product_id), compute, LAST_MODIFIED_TIMEOUT)
+
+
+def product_tags(product_id):
+    return [cache_tags.CATALOG, cache_tags.product_tag(product_id),
+            cache_tags.reviews_tag(product_id)]
+
+
+def _etag(request, last_modified, tags):
+    versions = cache_tags.tag_versions(tags)
+    parts = [last_modified.isoformat(), str(request.user.pk or 0), get_request_currency(request).code]
+    parts += [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    return catalog_last_modified()
+
+
+def _catalog_etag(request, *args, **kwargs):
+    return _etag(request, catalog_last_modified(), [cache_tags.CATALOG])
+
+
+def _product_last_modified(request, product_id, *args, **kwargs):
+    return product_last_modified(product_id)
+
+
+def _product_etag(request, product_id, *args, **kwargs):
+    last_modified = product_last_modified(product_id)
+    if last_modified is None:
+        # Produit inexistant : pas de validateur, la vue renverra 404
+        return None
+    return _etag(request, last_modified, product_tags(product_id))
+
+
+def rates_etag(matrix, currency, with_catalog=False):
+    """
+    ETag d'une réponse de conversion : version de l'instantané de taux utilisé
+    et devise cible (qui peut venir du cookie, hors de l'URL)
+    """
+    parts = [matrix.version, currency]
+    if with_catalog:
+        # Les prix des produits viennent du catalogue
+        parts.append(str(cache_tags.tag_versions([cache_tags.CATALOG])[cache_tags.CATALOG]))
+    return '-'.join(parts)
+
+
+def _rates_etag(request, *args, **kwargs):
+    currency = request.GET.get('to') or get_request_currency(request).code
+    return rates_etag(exchange_rates.get_matrix(), currency, with_catalog=bool(request.GET.get('products')))
+
+
+def rates_condition(view_func):
+    """
+    GET conditionnel d'une conversion ; la vue pose elle-même l'ETag de
+    l'instantané qu'elle a utilisé. Sans `to`, la devise vient du cookie :
+    la réponse (200 ou 304) varie selon Cookie.
+    """
+    conditional_view = condition(etag_func=_rates_etag)(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        if not request.GET.get('to'):
+            patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapper
+
+
+# Décorateurs à placer au-dessus du cache de page : un 304 évite tout rendu
+catalog_condition = condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+product_condition = condition(etag_func=_product_etag, last_modified_func=_product_last_modified)
@@ -1,17 +1,16 @@
 # currency_service.py - Service pour gérer les conversions de devises
 
-import requests
 from decimal import Decimal
-from django.core.cache import cache
-from django.conf import settings
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from . import exchange_rates, price_format
+from .request_currency import default_currency, preferred_currency_code
 
 class CurrencyConverter:
     """Service de conversion de devises avec API ExchangeRate"""
     
-    # API gratuite: https://www.exchangerate-api.com/
-    API_URL = "https://api.exchangerate-api.com/v4/latest/"
-    CACHE_TIMEOUT = 3600  # 1 heure
+    # Devise des prix enregistrés (Product.price, effective_price)
+    PRICE_CURRENCY = 'EUR'
     
     # Configuration des devises supportées
     SUPPORTED_CURRENCIES = {
@@ -38,37 +37,11 @@ class CurrencyConverter:
     @classmethod
     def get_exchange_rates(cls, base_currency='XOF'):
         """
-        Récupère les taux de change depuis l'API
-        Utilise le cache pour éviter trop de requêtes
+        Récupère les taux de change enregistrés (cache puis base de données),
+        sans jamais appeler l'API pendant la requête : les taux périmés sont
+        servis et rafraîchis en tâche de fond (voir exchange_rates.py)
         """
-        cache_key = f'exchange_rates_{base_currency}'
-        rates = cache.get(cache_key)
-        
-        if rates is None:
-            try:
-                # Appel à l'API
-                response = requests.get(
-                    f"{cls.API_URL}{base_currency}",
-                    timeout=10
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                rates = {
-                    'base': base_currency,
-                    'rates': data.get('rates', {}),
-                    'timestamp': data.get('time_last_updated', datetime.now().isoformat())
-                }
-                
-                # Mise en cache
-                cache.set(cache_key, rates, cls.CACHE_TIMEOUT)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"Erreur lors de la récupération des taux: {e}")
-                # Retourner des taux par défaut en cas d'erreur
-                rates = cls._get_fallback_rates(base_currency)
-        
-        return rates
+        return exchange_rates.get_rates(base_currency)
     
     @classmethod
     def _get_fallback_rates(cls, base_currency='XOF'):
@@ -112,20 +85,12 @@ class CurrencyConverter:
         Returns:
             Decimal: Montant converti
         """
+        amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
         if from_currency == to_currency:
-            return Decimal(str(amount))
-        
-        # Récupérer les taux de change
-        rates_data = cls.get_exchange_rates(from_currency)
-        rates = rates_data.get('rates', {})
-        
-        if to_currency not in rates:
-            raise ValueError(f"Devise {to_currency} non supportée")
-        
-        rate = Decimal(str(rates[to_currency]))
-        converted_amount = Decimal(str(amount)) * rate
+            return amount
         
-        return converted_amount.quantize(Decimal('0.01'))
+        # Taux croisés précalculés : une recherche et une multiplication
+        return exchange_rates.get_matrix().convert(amount, from_currency, to_currency)
     
     @classmethod
     def convert_price(cls, price, from_currency='XOF', to_currency='USD'):
@@ -140,11 +105,23 @@ class CurrencyConverter:
         
         return {
             'amount': converted,
-            'formatted': f"{currency_info.get('symbol', '')} {converted:,.2f}",
+            'formatted': format_price(converted, to_currency),
             'symbol': currency_info.get('symbol', ''),
             'code': to_currency
         }
     
+    @classmethod
+    def convert_prices(cls, amounts, from_currency, to_currency, matrix=None):
+        """
+        Convertit et formate plusieurs montants avec un même instantané de taux
+        
+        Returns:
+            list: [{amount: Decimal, formatted: str}, ...] dans l'ordre des montants
+        """
+        matrix = matrix or exchange_rates.get_matrix()
+        converted = matrix.convert_many(amounts, from_currency, to_currency)
+        return [{'amount': amount, 'formatted': format_price(amount, to_currency)} for amount in converted]
+    
     @classmethod
     def get_all_conversions(cls, amount, base_currency='XOF'):
         """
@@ -167,18 +144,14 @@ class CurrencyConverter:
 
 # Fonctions utilitaires pour les templates
 def format_price(amount, currency_code='XOF'):
-    """Formate un prix avec le symbole de la devise"""
-    currency_info = CurrencyConverter.SUPPORTED_CURRENCIES.get(currency_code, {})
-    symbol = currency_info.get('symbol', currency_code)
-    return f"{symbol} {amount:,.2f}"
+    """Formate un prix selon les règles de la devise (voir price_format.py)"""
+    return price_format.format_price(amount, currency_code)
 
 
 def get_user_currency(user):
-    """Récupère la devise préférée de l'utilisateur"""
-    if user.is_authenticated:
-        try:
-            preference = user.currency_preference
-            return preference.preferred_currency.code if preference.preferred_currency else 'XOF'
-        except:
-            pass
-    return 'XOF'  # Devise par défaut
\ No newline at end of file
+    """
+    Récupère la devise préférée de l'utilisateur (une requête). Dans une vue,
+    préférer request.currency, résolu une seule fois par requête.
+    """
+    code = preferred_currency_code(user) if user is not None else None
+    return code if code in CurrencyConverter.SUPPORTED_CURRENCIES else default_currency()
\ No newline at end of file
@@ -0,0 +1,216 @@
+# exchange_rates.py - Taux de change persistés (ExchangeRate) et rafraîchis en tâche de fond
+
+"""
+Les requêtes HTTP ne contactent jamais l'API de taux : elles lisent la
+matrice de taux croisés (rate_matrix.py) en mémoire, dans le cache, puis
+dans la table ExchangeRate. Des taux plus vieux que CACHE_TIMEOUT restent
+servis (stale-while-revalidate) pendant qu'un rafraîchissement est mis en
+file (tâche `refresh_exchange_rates`). L'appel à l'API n'a lieu que dans
+refresh_rates(), depuis la tâche ou la commande `refresh_exchange_rates`.
+
+L'URL de l'API vient de CURRENCY_SETTINGS['EXCHANGE_RATE_API_URL'] ; les
+appels passent par rate_provider.py (session réutilisée, disjoncteur). La
+commande `exchange_rate_stub_server` fournit une API locale pour les tests.
+"""
+
+import logging
+import time
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Currency, ExchangeRate
+from .rate_matrix import RateMatrix
+from .rate_provider import ProviderUnavailable, get_client
+from .single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://api.exchangerate-api.com/v4/latest/'
+# Délai minimal entre deux mises en file d'un rafraîchissement
+REFRESH_THROTTLE = 60
+# Durée pendant laquelle un processus réutilise sa matrice sans relire le cache
+LOCAL_TTL = 5
+# Relecture périodique de la table : un rafraîchissement fait par un autre
+# processus est vu même avec un cache local (LocMemCache)
+MATRIX_CACHE_TIMEOUT = 300
+# Précision de la colonne ExchangeRate.rate
+STORED_QUANTUM = Decimal('0.000001')
+
+_local = {}
+
+MATRIX_CACHE_KEY = 'exchange_rate_matrix'
+REFRESH_SCHEDULED_KEY = 'exchange_rates_refresh_scheduled'
+
+
+def _setting(name, default):
+    return getattr(settings, 'CURRENCY_SETTINGS', {}).get(name, default)
+
+
+def api_url():
+    return _setting('EXCHANGE_RATE_API_URL', DEFAULT_API_URL)
+
+
+def pivot():
+    """Devise dont les taux sont demandés à l'API (un seul appel par rafraîchissement)"""
+    return _setting('PIVOT_CURRENCY', 'EUR')
+
+
+def stale_after():
+    return timedelta(seconds=_setting('CACHE_TIMEOUT', 3600))
+
+
+def supported_codes():
+    from .currency_service import CurrencyConverter
+    return list(CurrencyConverter.SUPPORTED_CURRENCIES)
+
+
+def fetch_rates(base):
+    """Appel bloquant à l'API : taux {code: Decimal} depuis `base` (tâches uniquement)"""
+    return get_client(api_url()).fetch(base, supported_codes())
+
+
+def _currencies():
+    """Devises supportées, créées au besoin (comme init_currencies)"""
+    from .currency_service import CurrencyConverter
+    currencies = {currency.code: currency for currency in Currency.objects.all()}
+    for code, info in CurrencyConverter.SUPPORTED_CURRENCIES.items():
+        if code not in currencies:
+            currencies[code], _ = Currency.objects.get_or_create(code=code, defaults={
+                'name': info['name'], 'symbol': info['symbol'],
+                'flag': info['flag'], 'is_default': info['is_default'],
+            })
+    return currencies
+
+
+def store_matrix(matrix):
+    """Enregistre tous les taux croisés de la matrice (upsert) et invalide le cache"""
+    currencies = _currencies()
+    rows = [
+        ExchangeRate(base_currency=currencies[source], target_currency=currencies[target],
+                     rate=rate.quantize(STORED_QUANTUM))
+        for (source, target), rate in matrix.rates.items()
+        if source in currencies and target in currencies
+    ]
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['base_currency', 'target_currency'],
+            update_fields=['rate', 'last_updated'],
+        )
+    cache.delete(MATRIX_CACHE_KEY)
+    _local.clear()
+    return len(rows)
+
+
+def refresh_rates():
+    """
+    Un seul appel à l'API (devise pivot), tous les taux croisés en sont dérivés.
+    Retourne la nouvelle matrice, ou None en cas d'échec ou si un autre appelant
+    rafraîchit déjà (les anciens taux restent).
+    """
+    base = pivot()
+    # Un seul appel à l'API à la fois, tous workers confondus
+    with single_flight('exchange_rates_refresh', ttl=get_client(api_url()).total_timeout * 3) as leader:
+        if not leader:
+            logger.info("Rafraîchissement des taux déjà en cours")
+            return None
+        try:
+            matrix = RateMatrix.from_pivot(base, fetch_rates(base), updated_at=timezone.now())
+        except (requests.exceptions.RequestException, ValueError, ProviderUnavailable) as e:
+            logger.warning("Rafraîchissement des taux %s impossible: %s", base, e)
+            return None
+        store_matrix(matrix)
+    from . import jobs
+    # Prix des listes dans chaque devise, recalculés avec les nouveaux taux
+    jobs.enqueue('rebuild_price_projection', dedupe_key='rebuild_price_projection')
+    return matrix
+
+
+def schedule_refresh():
+    """Met un rafraîchissement en file, au plus une fois par REFRESH_THROTTLE secondes"""
+    if not _setting('AUTO_UPDATE_RATES', True):
+        return
+    if not cache.add(REFRESH_SCHEDULED_KEY, True, REFRESH_THROTTLE):
+        return
+    from . import jobs
+    jobs.enqueue('refresh_exchange_rates', dedupe_key='refresh_exchange_rates')
+
+
+def load_matrix():
+    """Matrice construite depuis les taux enregistrés de la devise pivot, ou None"""
+    base = pivot()
+    rows = list(
+        ExchangeRate.objects.filter(base_currency__code=base)
+        .values_list('target_currency__code', 'rate', 'last_updated')
+    )
+    if not rows:
+        return None
+    updated_at = min(updated for _, _, updated in rows)
+    return RateMatrix.from_pivot(
+        base, {code: rate for code, rate, _ in rows},
+        updated_at=updated_at, version=f'{base}-{updated_at.timestamp():.0f}',
+    )
+
+
+def _fallback_matrix():
+    from .currency_service import CurrencyConverter
+    base = pivot()
+    rates = CurrencyConverter._get_fallback_rates(base)['rates']
+    return RateMatrix.from_pivot(base, {code: Decimal(str(rate)) for code, rate in rates.items()},
+                                 version=f'{base}-fallback', fallback=True)
+
+
+def get_matrix():
+    """
+    Matrice courante sans jamais attendre l'API : mémoire du processus
+    (revalidée toutes les LOCAL_TTL secondes), cache, puis table ExchangeRate.
+    Des taux périmés sont servis et un rafraîchissement est programmé ; sans
+    aucun taux enregistré, les taux de secours sont utilisés.
+    """
+    now = time.monotonic()
+    local = _local.get('matrix')
+    if local is not None and now - _local['checked_at'] < LOCAL_TTL:
+        return local
+
+    matrix = cache.get(MATRIX_CACHE_KEY)
+    if matrix is None:
+        with single_flight(MATRIX_CACHE_KEY, ttl=10) as leader:
+            if not leader and local is not None:
+                # Un autre appelant recharge la matrice : dernière valeur connue
+                return local
+            matrix = load_matrix()
+            if matrix is None:
+                schedule_refresh()
+                matrix = _fallback_matrix()
+            else:
+                # Le cache ne sert qu'à éviter la requête ; la fraîcheur vient de updated_at
+                cache.set(MATRIX_CACHE_KEY, matrix, MATRIX_CACHE_TIMEOUT)
+
+    if matrix.updated_at and timezone.now() - matrix.updated_at > stale_after():
+        schedule_refresh()
+        matrix = replace(matrix, stale=True)
+    _local.update(matrix=matrix, checked_at=now)
+    return matrix
+
+
+def get_rates(base):
+    """Taux depuis `base` au format historique de CurrencyConverter.get_exchange_rates"""
+    matrix = get_matrix()
+    data = {
+        'base': base,
+        'rates': {code: float(rate) for code, rate in matrix.rates_from(base).items()},
+        'timestamp': (matrix.updated_at or timezone.now()).isoformat(),
+    }
+    if matrix.stale:
+        data['stale'] = True
+    if matrix.fallback:
+        data['fallback'] = True
+    return data
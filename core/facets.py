@@ -0,0 +1,134 @@
+# facets.py - Compteurs de filtres (facettes) pour les listes de produits
+
+import hashlib
+import json
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from . import cache_tags
+from .models import Product
+
+FACETS_CACHE_TIMEOUT = 300  # 5 minutes
+
+# Tranches de prix (borne basse incluse, borne haute exclue)
+PRICE_BUCKETS = [
+    ('0-10', Decimal('0'), Decimal('10')),
+    ('10-25', Decimal('10'), Decimal('25')),
+    ('25-50', Decimal('25'), Decimal('50')),
+    ('50-100', Decimal('50'), Decimal('100')),
+    ('100-500', Decimal('100'), Decimal('500')),
+    ('500+', Decimal('500'), None),
+]
+
+
+# Tranches propres aux devises dont l'ordre de grandeur diffère de l'EUR
+CURRENCY_PRICE_BUCKETS = {
+    'XOF': [
+        ('0-5000', Decimal('0'), Decimal('5000')),
+        ('5000-15000', Decimal('5000'), Decimal('15000')),
+        ('15000-30000', Decimal('15000'), Decimal('30000')),
+        ('30000-65000', Decimal('30000'), Decimal('65000')),
+        ('65000-325000', Decimal('65000'), Decimal('325000')),
+        ('325000+', Decimal('325000'), None),
+    ],
+}
+
+
+def price_buckets(currency=None):
+    """Tranches de prix exprimées dans `currency`"""
+    return CURRENCY_PRICE_BUCKETS.get(currency, PRICE_BUCKETS)
+
+
+def price_bucket_range(key, currency=None):
+    """Retourne (min, max) d'une tranche de prix, ou None si inconnue"""
+    for bucket_key, low, high in price_buckets(currency):
+        if bucket_key == key:
+            return low, high
+    return None
+
+
+def _price_field(queryset):
+    """Prix dans la devise de la liste si le queryset passe par price_projection.in_currency"""
+    return 'display_price' if 'display_price' in queryset.query.annotations else 'effective_price'
+
+
+def _bucket_expression(field='effective_price', currency=None):
+    whens = []
+    for key, low, high in price_buckets(currency):
+        condition = Q(**{f'{field}__gte': low})
+        if high is not None:
+            condition &= Q(**{f'{field}__lt': high})
+        whens.append(When(condition, then=Value(key)))
+    return Case(*whens, default=Value(''), output_field=CharField())
+
+
+def filter_signature(**filters):
+    """Signature stable d'un ensemble de filtres (valeurs vides ignorées)"""
+    normalized = {key: str(value).strip().lower() for key, value in filters.items()
+                  if value not in (None, '')}
+    raw = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def compute_facets(queryset, currency=None):
+    """
+    Calcule toutes les facettes d'un queryset de ProductCard en une seule
+    requête GROUP BY (catégorie, type, tranche de prix, stock) puis les
+    replie en Python. Les tranches de prix sont dans `currency`.
+    """
+    buckets = price_buckets(currency)
+    rows = (
+        queryset.order_by()
+        .values(
+            'category_id', 'category_name', 'product_type', 'in_stock',
+            bucket=_bucket_expression(_price_field(queryset), currency),
+        )
+        .annotate(count=Count('pk'))
+    )
+
+    categories = {}
+    product_types = {}
+    bucket_counts = {key: 0 for key, _, _ in buckets}
+    stock = {'in_stock': 0, 'out_of_stock': 0}
+    total = 0
+
+    for row in rows:
+        count = row['count']
+        total += count
+        category = categories.setdefault(
+            row['category_id'],
+            {'id': row['category_id'], 'name': row['category_name'], 'count': 0}
+        )
+        category['count'] += count
+        product_types[row['product_type']] = product_types.get(row['product_type'], 0) + count
+        if row['bucket']:
+            bucket_counts[row['bucket']] += count
+        stock['in_stock' if row['in_stock'] else 'out_of_stock'] += count
+
+    type_labels = dict(Product.PRODUCT_TYPES)
+    return {
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda c: c['name']),
+        'product_types': [
+            {'value': value, 'label': type_labels.get(value, value), 'count': count}
+            for value, count in sorted(product_types.items())
+        ],
+        'price_buckets': [
+            {'key': key, 'min': low, 'max': high, 'count': bucket_counts[key]}
+            for key, low, high in buckets
+        ],
+        'currency': currency,
+        'stock': stock,
+    }
+
+
+def get_facets(queryset, signature, currency=None):
+    """
+    Facettes mises en cache par signature de filtres normalisée (qui doit
+    inclure la devise), invalidées à chaque modification du catalogue
+    """
+    return cache_tags.get_or_set(
+        f'product_facets_{signature}', [cache_tags.CATALOG],
+        lambda: compute_facets(queryset, currency), FACETS_CACHE_TIMEOUT,
+    )
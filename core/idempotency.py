@@ -0,0 +1,152 @@
+# idempotency.py - Rejeu des requêtes POST portant un en-tête Idempotency-Key
+
+"""
+La première requête portant une clé réserve une ligne IdempotencyKey, exécute
+la vue puis enregistre sa réponse (table + cache). Une nouvelle tentative avec
+la même clé rejoue la réponse enregistrée sans rien recalculer ; une tentative
+arrivant pendant le traitement de la première reçoit un 409.
+
+Les cookies posés par la réponse (panier en cookie signé, voir
+cart_storage.finalize_cart) sont enregistrés et rejoués avec elle.
+
+Seules les réponses 2xx sont conservées : après une erreur (stock insuffisant,
+panier vide...) la même clé peut être réessayée une fois la cause corrigée.
+
+Une ligne réservée n'est valable que PROCESSING_LEASE secondes tant que sa
+réponse n'est pas enregistrée : après un arrêt brutal du processus, la clé
+redevient utilisable au lieu de répondre 409 pendant IDEMPOTENCY_TTL.
+
+Les clés des visiteurs anonymes ne sont liées qu'à elles-mêmes (et au corps
+de la requête) : une nouvelle tentative dont la première réponse s'est
+perdue n'a pas forcément de cookie de session. Les clés générées par le
+navigateur sont des UUID aléatoires.
+"""
+
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .cart_storage import finalize_cart
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = timedelta(hours=24)
+PROCESSING_LEASE = timedelta(seconds=60)
+ANONYMOUS_OWNER = 'anonymous'
+MAX_KEY_LENGTH = 255
+
+
+def _owner(request):
+    """Les clés sont propres à un utilisateur ; pas de session créée pour un anonyme"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return ANONYMOUS_OWNER
+
+
+def _cache_key(scope, owner, key):
+    digest = hashlib.sha1(f'{scope}|{owner}|{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+
+def _replay(stored):
+    response = HttpResponse(stored['body'], status=stored['status'],
+                            content_type=stored['content_type'])
+    for cookie in stored.get('cookies', ()):
+        response.cookies.load(cookie)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def purge_expired():
+    """Supprime les clés expirées, retourne le nombre de lignes supprimées"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def _reserve(scope, owner, key, request_hash):
+    """
+    Réserve la clé pour PROCESSING_LEASE ; retourne (ligne créée, None) ou
+    (None, ligne existante). Une ligne expirée (ou une réservation abandonnée)
+    mais pas encore purgée est remplacée.
+    """
+    for _ in range(2):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    scope=scope, owner=owner, key=key,
+                    request_hash=request_hash, expires_at=now + PROCESSING_LEASE,
+                ), None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(scope=scope, owner=owner, key=key).first()
+            if existing is not None and existing.expires_at > now:
+                return None, existing
+            IdempotencyKey.objects.filter(scope=scope, owner=owner, key=key,
+                                          expires_at__lte=now).delete()
+    raise IntegrityError(f'Idempotency-Key {key} could not be reserved')
+
+
+def idempotent(scope, ttl=IDEMPOTENCY_TTL):
+    """Rend une vue POST rejouable via l'en-tête Idempotency-Key"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER, '').strip()
+            if request.method != 'POST' or not key:
+                return view_func(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'success': False, 'message': 'Idempotency-Key trop longue'},
+                                    status=400)
+
+            owner = _owner(request)
+            request_hash = hashlib.sha256(request.body).hexdigest()
+            cache_key = _cache_key(scope, owner, key)
+
+            stored = cache.get(cache_key)
+            if stored is not None and stored['request_hash'] == request_hash:
+                return _replay(stored)
+
+            record, existing = _reserve(scope, owner, key, request_hash)
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return JsonResponse(
+                        {'success': False, 'message': 'Idempotency-Key déjà utilisée pour une autre requête'},
+                        status=422)
+                if existing.status_code is None:
+                    return JsonResponse({'success': False, 'message': 'Requête déjà en cours'},
+                                        status=409)
+                return _replay({'status': existing.status_code, 'content_type': existing.content_type,
+                                'body': existing.response_body, 'cookies': existing.response_cookies})
+
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+
+            if 200 <= response.status_code < 300 and not response.streaming:
+                # Les cookies du panier font partie de la réponse à rejouer
+                finalize_cart(request, response)
+                stored = {
+                    'request_hash': request_hash,
+                    'status': response.status_code,
+                    'content_type': response['Content-Type'],
+                    'body': response.content.decode(response.charset),
+                    'cookies': [morsel.OutputString() for morsel in response.cookies.values()],
+                }
+                IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status_code=stored['status'], content_type=stored['content_type'],
+                    response_body=stored['body'], response_cookies=stored['cookies'],
+                    expires_at=timezone.now() + ttl,
+                )
+                cache.set(cache_key, stored, int(ttl.total_seconds()))
+            else:
+                record.delete()
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,186 @@
+# jobs.py - File de tâches de fond stockée en base (sans broker externe)
+
+"""
+Les vues se contentent d'appeler enqueue() ; la commande `manage.py run_jobs`
+réserve les tâches prêtes (status='queued', run_at passé), par priorité
+décroissante, et les exécute dans un pool de threads.
+
+Une tâche est une fonction enregistrée avec @job, appelée avec son payload
+(dict JSON) en arguments nommés. En cas d'exception elle est reprogrammée
+avec un délai exponentiel jusqu'à max_attempts, puis marquée 'failed'.
+
+Pendant l'exécution, le worker rafraîchit locked_at de ses tâches toutes les
+HEARTBEAT_INTERVAL (heartbeat()) : requeue_stale() ne reprend que les tâches
+dont le worker ne donne plus signe de vie, quelle que soit leur durée.
+
+Les tâches déclarées avec every=timedelta(...) sont mises en file par le
+worker lui-même (schedule_periodic(), appelée périodiquement par run_jobs),
+au plus une fois par intervalle tous workers confondus.
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+RETRY_BASE_DELAY = 30  # secondes, doublé à chaque tentative
+RETRY_MAX_DELAY = 3600
+# Une tâche 'running' sans heartbeat depuis plus longtemps appartient à un worker mort
+STALE_AFTER = timedelta(minutes=15)
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+
+
+class UnknownJob(LookupError):
+    """Aucune fonction enregistrée sous ce nom"""
+
+
+def job(name=None, priority=0, max_attempts=5, atomic=True, every=None):
+    """
+    Enregistre une fonction comme tâche de fond. Avec atomic=False la tâche
+    gère ses propres transactions (longs traitements par lots, qui ne doivent
+    pas garder le verrou d'écriture jusqu'à la fin). Avec every (timedelta),
+    la tâche est périodique et ne prend pas de payload.
+    """
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+        func.job_name = job_name
+        func.job_options = {'priority': priority, 'max_attempts': max_attempts,
+                            'atomic': atomic, 'every': every}
+        REGISTRY[job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func_or_name, payload=None, priority=None, run_at=None, delay=None, dedupe_key=''):
+    """
+    Met une tâche en file. Appelée dans une transaction, la tâche n'est
+    visible qu'au commit (et disparaît avec un rollback).
+    Avec dedupe_key, rien n'est ajouté si une tâche de même clé attend déjà.
+    """
+    name = getattr(func_or_name, 'job_name', func_or_name)
+    if name not in REGISTRY:
+        raise UnknownJob(name)
+    options = REGISTRY[name].job_options
+
+    if dedupe_key and Job.objects.filter(status='queued', dedupe_key=dedupe_key).exists():
+        return None
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta(0))
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=options['priority'] if priority is None else priority,
+        max_attempts=options['max_attempts'],
+        run_at=run_at,
+        dedupe_key=dedupe_key,
+    )
+
+
+def claim(worker_id, limit):
+    """
+    Réserve jusqu'à `limit` tâches prêtes pour ce worker. Le passage à
+    'running' est conditionné à status='queued' : deux workers ne peuvent
+    pas réserver la même tâche.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('-priority', 'run_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+    Job.objects.filter(pk__in=candidates, status='queued').update(
+        status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return list(
+        Job.objects.filter(pk__in=candidates, status='running', locked_by=worker_id, locked_at=now)
+        .order_by('-priority', 'run_at', 'pk')
+    )
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def run(job_record):
+    """Exécute une tâche réservée et enregistre son résultat ; retourne True si réussie"""
+    try:
+        func = REGISTRY.get(job_record.name)
+        if func is None:
+            raise UnknownJob(job_record.name)
+        if func.job_options.get('atomic', True):
+            with transaction.atomic():
+                func(**job_record.payload)
+        else:
+            func(**job_record.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Tâche %s #%s en échec (tentative %s/%s)", job_record.name,
+                       job_record.pk, job_record.attempts, job_record.max_attempts)
+        if job_record.attempts < job_record.max_attempts:
+            Job.objects.filter(pk=job_record.pk).update(
+                status='queued', run_at=timezone.now() + _retry_delay(job_record.attempts),
+                locked_by='', locked_at=None, last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job_record.pk).update(
+                status='failed', finished_at=timezone.now(), last_error=error,
+            )
+        return False
+
+    Job.objects.filter(pk=job_record.pk).update(status='done', finished_at=timezone.now())
+    return True
+
+
+def heartbeat(worker_id, job_ids):
+    """Signale que ces tâches du worker tournent encore (locked_at = maintenant)"""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(pk__in=job_ids, status='running', locked_by=worker_id).update(
+        locked_at=timezone.now()
+    )
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Remet en file les tâches dont le worker n'envoie plus de heartbeat"""
+    return Job.objects.filter(
+        status='running', locked_at__lt=timezone.now() - older_than
+    ).update(status='queued', locked_by='', locked_at=None)
+
+
+def schedule_periodic():
+    """
+    Met en file les tâches périodiques sans exécution en attente, en cours
+    ou créée depuis moins de leur intervalle ; retourne le nombre ajouté
+    """
+    now = timezone.now()
+    scheduled = 0
+    for name, func in REGISTRY.items():
+        every = func.job_options.get('every')
+        if every is None:
+            continue
+        dedupe_key = f'periodic:{name}'
+        recent = Job.objects.filter(dedupe_key=dedupe_key).filter(
+            Q(status__in=['queued', 'running']) | Q(created_at__gte=now - every)
+        )
+        if not recent.exists() and enqueue(name, dedupe_key=dedupe_key):
+            scheduled += 1
+    return scheduled
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Supprime les tâches terminées depuis plus de `older_than`"""
+    deleted, _ = Job.objects.filter(
+        status='done', finished_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
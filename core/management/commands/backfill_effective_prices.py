@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core import cache_tags, cards
+from core.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored effective price and discount percentage of every product'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Product.objects.all().refresh_pricing()
+            # refresh_pricing is a raw UPDATE: rebuild the cards and their
+            # per-currency prices, then invalidate every cached catalog page
+            cards.rebuild_cards()
+            cache_tags.bump(cache_tags.CATALOG)
+        self.stdout.write(self.style.SUCCESS(f'Pricing refreshed for {updated} products'))
@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.cart_storage import CART_STORES
+from core.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Compare add-to-cart throughput of the cart storage backends under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per thread')
+        parser.add_argument('--backend', choices=list(CART_STORES), action='append',
+                            help='Backend to benchmark (repeatable, default: all)')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.filter(is_active=True).values_list('pk', flat=True)[:20])
+        if not product_ids:
+            self.stderr.write('No active product to add to carts')
+            return
+
+        for backend in options['backend'] or list(CART_STORES):
+            with override_settings(CART_STORAGE=backend):
+                elapsed, errors = self._run(product_ids, options['threads'], options['requests'])
+            total = options['threads'] * options['requests']
+            self.stdout.write(
+                f'{backend:<14} {total} requests in {elapsed:.2f}s '
+                f'({total / elapsed:.0f} req/s, {errors} errors)'
+            )
+
+    def _run(self, product_ids, threads, requests):
+        errors = [0]
+        lock = threading.Lock()
+
+        def worker():
+            # Un client par thread : chaque thread est un visiteur avec ses propres cookies
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            try:
+                for i in range(requests):
+                    response = client.post(
+                        '/api/add-to-cart/',
+                        json.dumps({'product_id': product_ids[i % len(product_ids)], 'quantity': 1}),
+                        content_type='application/json',
+                    )
+                    if response.status_code != 200:
+                        with lock:
+                            errors[0] += 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started, errors[0]
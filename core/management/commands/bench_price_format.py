@@ -0,0 +1,67 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+
+from core import price_format
+from core.currency_service import CurrencyConverter
+
+
+def legacy_format(amount, currency_code):
+    """Previous formatting: dict lookups and an f-string on every call"""
+    currency_info = CurrencyConverter.SUPPORTED_CURRENCIES.get(currency_code, {})
+    symbol = currency_info.get('symbol', currency_code)
+    return f"{symbol} {amount:,.2f}"
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark of price formatting: per-call cost of the legacy f-string, '
+        'the compiled formatters with a cold and a hot cache, and a template page '
+        'rendering hundreds of prices'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prices', type=int, default=500, help='Prices on a simulated page')
+        parser.add_argument('--pages', type=int, default=50, help='Page renders per measurement')
+
+    def handle(self, *args, **options):
+        count, pages = options['prices'], options['pages']
+        rng = random.Random(42)
+        amounts = [Decimal(rng.randint(100, 5_000_000)) / 100 for _ in range(count)]
+        calls = count * pages
+
+        self.stdout.write(f'{count} prices per page, {pages} pages per measurement')
+        for code in CurrencyConverter.SUPPORTED_CURRENCIES:
+            formatter = price_format.get_formatter(code)
+            legacy = self._per_call(lambda: [legacy_format(a, code) for a in amounts], pages, calls)
+
+            def cold():
+                formatter.cache_clear()
+                return [formatter(a) for a in amounts]
+            compiled_cold = self._per_call(cold, pages, calls)
+            formatter(amounts[0])
+            compiled_hot = self._per_call(lambda: [formatter(a) for a in amounts], pages, calls)
+            self.stdout.write(
+                f'{code}: legacy {legacy:.0f}ns, compiled (cold) {compiled_cold:.0f}ns, '
+                f'compiled (hot) {compiled_hot:.0f}ns per call  e.g. {formatter(amounts[0])!r}'
+            )
+
+        template = Template(
+            '{% load currency_tags %}{% for amount in amounts %}'
+            '<span>{{ amount|format_currency:currency }}</span>{% endfor %}'
+        )
+        for code in CurrencyConverter.SUPPORTED_CURRENCIES:
+            context = Context({'amounts': amounts, 'currency': code})
+            per_page = min(timeit.repeat(lambda: template.render(context), number=pages, repeat=3)) / pages
+            self.stdout.write(
+                f'template {code}: {per_page * 1000:.2f}ms per page '
+                f'({per_page * 1e6 / count:.1f}µs per price, filter and template overhead included)'
+            )
+
+    @staticmethod
+    def _per_call(func, pages, calls):
+        """Best of three runs, in nanoseconds per formatted price"""
+        return min(timeit.repeat(func, number=pages, repeat=3)) / calls * 1e9
@@ -0,0 +1,55 @@
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from core.currency_service import CurrencyConverter
+
+PATH_RE = re.compile(r'^/v4/latest/([A-Z]{3})/?$')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers /v4/latest/<BASE> like exchangerate-api.com, with the fallback rates"""
+
+    def do_GET(self):
+        match = PATH_RE.match(self.path)
+        rates = CurrencyConverter._get_fallback_rates(match.group(1))['rates'] if match else {}
+        if not rates:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({
+            'base': match.group(1),
+            'rates': rates,
+            'time_last_updated': 0,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a local exchange-rate API for tests. Point '
+        "CURRENCY_SETTINGS['EXCHANGE_RATE_API_URL'] at http://127.0.0.1:<port>/v4/latest/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), StubHandler)
+        self.stdout.write(f"Stub exchange-rate API on http://127.0.0.1:{options['port']}/v4/latest/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
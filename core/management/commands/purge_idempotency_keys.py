@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys and their stored responses'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired idempotency keys deleted'))
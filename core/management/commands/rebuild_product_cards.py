@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from core import cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized product cards used by listing pages'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding product cards...')
+        count = cards.rebuild_cards()
+        self.stdout.write(self.style.SUCCESS(f'{count} product cards built'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = 'FTS5' if search.uses_fts() else 'inverted index'
+        self.stdout.write(f'Rebuilding search index ({backend})...')
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products'))
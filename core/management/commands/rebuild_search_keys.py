@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.models import Category, Product
+from core.normalization import search_key
+
+
+class Command(BaseCommand):
+    help = 'Backfill the normalized search keys of products and categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, max_length in ((Category, 200), (Product, 255)):
+            updated = 0
+            batch = []
+            for obj in model.objects.only('pk', 'name', 'search_key').iterator(chunk_size=batch_size):
+                key = search_key(obj.name, max_length)
+                if obj.search_key != key:
+                    obj.search_key = key
+                    batch.append(obj)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ['search_key'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ['search_key'])
+                updated += len(batch)
+            self.stdout.write(
+                self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {updated} search keys updated')
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from core import exchange_rates, rate_provider
+
+
+class Command(BaseCommand):
+    help = 'Fetch the pivot currency rates from the API and store all cross rates in ExchangeRate'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Fetching {exchange_rates.pivot()} rates from {exchange_rates.api_url()}...')
+        matrix = exchange_rates.refresh_rates()
+        metrics = rate_provider.last_metrics()
+        if metrics:
+            self.stdout.write('Provider: ' + ', '.join(f'{name} {value}' for name, value in metrics.items()))
+        if matrix is None:
+            self.stdout.write(self.style.WARNING('Refresh failed or already running, previous rates kept'))
+            return
+        for base in matrix.currencies:
+            rates = ', '.join(f'{code} {rate.normalize()}' for code, rate in sorted(matrix.rates_from(base).items()))
+            self.stdout.write(f'{base}: {rates}')
+        self.stdout.write(self.style.SUCCESS(f'{len(matrix.rates)} rates stored'))
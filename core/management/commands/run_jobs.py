@@ -0,0 +1,100 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is ready instead of polling')
+        parser.add_argument('--maintenance-interval', type=float, default=300,
+                            help='Seconds between stale-job requeues and periodic job scheduling')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        threads = options['threads']
+        free_slots = threading.Semaphore(threads)
+        stats = {'done': 0, 'failed': 0}
+        running = set()
+        lock = threading.Lock()
+
+        self.maintenance()
+        next_maintenance = time.monotonic() + options['maintenance_interval']
+        heartbeat_interval = jobs.HEARTBEAT_INTERVAL.total_seconds()
+        next_heartbeat = time.monotonic() + heartbeat_interval
+        self.stdout.write(f'Worker {worker_id} started with {threads} threads')
+
+        def execute(job_record):
+            try:
+                ok = jobs.run(job_record)
+                with lock:
+                    stats['done' if ok else 'failed'] += 1
+            finally:
+                with lock:
+                    running.discard(job_record.pk)
+                connection.close()
+                free_slots.release()
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            try:
+                while True:
+                    if time.monotonic() >= next_maintenance:
+                        close_old_connections()
+                        self.maintenance()
+                        next_maintenance = time.monotonic() + options['maintenance_interval']
+
+                    # Long jobs must not look abandoned to requeue_stale()
+                    if time.monotonic() >= next_heartbeat:
+                        with lock:
+                            job_ids = list(running)
+                        close_old_connections()
+                        jobs.heartbeat(worker_id, job_ids)
+                        next_heartbeat = time.monotonic() + heartbeat_interval
+
+                    # Ne réserve que ce que le pool peut exécuter tout de suite
+                    if not free_slots.acquire(timeout=options['poll_interval']):
+                        continue
+                    available = 1
+                    while available < threads and free_slots.acquire(blocking=False):
+                        available += 1
+
+                    close_old_connections()
+                    claimed = jobs.claim(worker_id, available)
+                    for _ in range(available - len(claimed)):
+                        free_slots.release()
+                    with lock:
+                        running.update(job_record.pk for job_record in claimed)
+                    for job_record in claimed:
+                        pool.submit(execute, job_record)
+
+                    if not claimed:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping, waiting for running jobs...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['done']} jobs done, {stats['failed']} failed"
+        ))
+
+    def maintenance(self):
+        """Requeue jobs left by dead workers and enqueue due periodic jobs"""
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f'{requeued} stale jobs requeued')
+        scheduled = jobs.schedule_periodic()
+        if scheduled:
+            self.stdout.write(f'{scheduled} periodic jobs scheduled')
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    # La table FTS5 n'existe que sur SQLite, les autres bases utilisent ProductSearchTerm
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS core_product_fts USING fts5("
+        "name, category_name, description, detailed_description, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_product_fts (rowid, name, category_name, description, detailed_description) "
+        "SELECT p.id, p.name, c.name, p.description, p.detailed_description "
+        "FROM core_product p JOIN core_category c ON c.id = p.category_id"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_product_back_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100)),
+                ("weight", models.PositiveIntegerField(default=1)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_terms",
+                        to="core.product",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("term", "product")},
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
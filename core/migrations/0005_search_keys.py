@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+from core.normalization import search_key
+
+
+def backfill_search_keys(apps, schema_editor):
+    for model_name, max_length in (("Category", 200), ("Product", 255)):
+        model = apps.get_model("core", model_name)
+        objects = list(model.objects.only("pk", "name"))
+        for obj in objects:
+            obj.search_key = search_key(obj.name, max_length)
+        model.objects.bulk_update(objects, ["search_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_product_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="search_key",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=200
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="search_key",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(backfill_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:45
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_search_keys"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["created_at"],
+                name="product_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["product_type", "created_at"],
+                name="product_act_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["category", "price"],
+                name="product_active_cat_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["rating"],
+                name="product_active_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["reviews_count"],
+                name="product_active_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "discount_price", "price", output_field=models.FloatField()
+                ),
+                condition=models.Q(("is_active", True)),
+                name="product_active_eff_price_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:46
+
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Round
+
+
+def cents(field):
+    return Cast(Round(F(field) * Value(100)), IntegerField())
+
+
+def backfill_pricing(apps, schema_editor):
+    Product = apps.get_model("core", "Product")
+    has_discount = Q(discount_price__gt=0)
+    # Même arrondi que Product.discount_percentage (demi vers le haut, en centimes)
+    price, discount = cents("price"), cents("discount_price")
+    Product.objects.update(
+        effective_price=Case(
+            When(has_discount, then=F("discount_price")), default=F("price")
+        ),
+        discount_percent=Case(
+            When(
+                has_discount & Q(price__gt=F("discount_price")),
+                then=(Value(200) * (price - discount) + price) / (Value(2) * price),
+            ),
+            default=0,
+            output_field=IntegerField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_product_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_cat_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_eff_price_idx",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="discount_percent",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+        ),
+        migrations.RunPython(backfill_pricing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["effective_price"],
+                name="product_active_eff_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["category", "effective_price"],
+                name="product_active_cat_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["product_type", "effective_price"],
+                name="product_act_type_price_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,190 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/600x400?text=Image+non+disponible"
+
+
+def populate_cards(apps, schema_editor):
+    # Même logique que core.cards.build_card, sur les modèles historiques
+    Product = apps.get_model("core", "Product")
+    ProductCard = apps.get_model("core", "ProductCard")
+    cards = []
+    for product in Product.objects.filter(is_active=True).select_related("category"):
+        if not product.display_stock:
+            badge = "hidden"
+        elif product.stock <= 0:
+            badge = "out_of_stock"
+        elif product.stock <= 5:
+            badge = "low_stock"
+        else:
+            badge = "in_stock"
+        cards.append(
+            ProductCard(
+                product_id=product.pk,
+                slug=product.slug,
+                name=product.name,
+                excerpt=Truncator(product.description).words(15)[:200],
+                category_id=product.category_id,
+                category_name=product.category.name,
+                product_type=product.product_type,
+                price=product.price,
+                effective_price=product.effective_price,
+                discount_percent=product.discount_percent,
+                thumbnail_url=product.image.url if product.image else PLACEHOLDER_IMAGE,
+                back_image_url=product.back_image.url if product.back_image else "",
+                rating=product.rating,
+                reviews_count=product.reviews_count,
+                in_stock=product.stock > 0,
+                stock_badge=badge,
+                is_featured=product.is_featured,
+                created_at=product.created_at,
+            )
+        )
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_product_effective_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductCard",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="card",
+                        serialize=False,
+                        to="core.product",
+                    ),
+                ),
+                ("slug", models.SlugField()),
+                ("name", models.CharField(max_length=255)),
+                ("excerpt", models.CharField(blank=True, max_length=200)),
+                ("category_name", models.CharField(max_length=200)),
+                (
+                    "product_type",
+                    models.CharField(
+                        choices=[
+                            ("cafe", "Café"),
+                            ("pain", "Pain"),
+                            ("machine", "Machine à café"),
+                            ("accessoire", "Accessoire"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "effective_price",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("discount_percent", models.PositiveSmallIntegerField(default=0)),
+                ("thumbnail_url", models.CharField(max_length=500)),
+                ("back_image_url", models.CharField(blank=True, max_length=500)),
+                ("rating", models.FloatField(default=0)),
+                ("reviews_count", models.IntegerField(default=0)),
+                ("in_stock", models.BooleanField(default=False)),
+                (
+                    "stock_badge",
+                    models.CharField(
+                        choices=[
+                            ("in_stock", "En stock"),
+                            ("low_stock", "Stock limité"),
+                            ("out_of_stock", "Rupture de stock"),
+                            ("hidden", "Stock non affiché"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("is_featured", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.category",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "product"], name="card_created_idx"
+                    ),
+                    models.Index(
+                        fields=["product_type", "created_at", "product"],
+                        name="card_type_created_idx",
+                    ),
+                    models.Index(
+                        fields=["effective_price", "product"], name="card_price_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "effective_price", "product"],
+                        name="card_cat_price_idx",
+                    ),
+                    models.Index(
+                        fields=["product_type", "effective_price", "product"],
+                        name="card_type_price_idx",
+                    ),
+                    models.Index(fields=["rating", "product"], name="card_rating_idx"),
+                    models.Index(
+                        fields=["reviews_count", "product"], name="card_popular_idx"
+                    ),
+                    models.Index(
+                        fields=["product_type", "rating", "product"],
+                        name="card_type_rating_idx",
+                    ),
+                    models.Index(
+                        fields=["product_type", "reviews_count", "product"],
+                        name="card_type_popular_idx",
+                    ),
+                    models.Index(
+                        fields=["is_featured", "created_at"], name="card_featured_idx"
+                    ),
+                ],
+            },
+        ),
+        # Les listes lisent ProductCard : les index de tri de Product ne servent plus
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_act_type_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_eff_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_cat_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_act_type_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_rating_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_active_popular_idx",
+        ),
+        migrations.RunPython(populate_cards, migrations.RunPython.noop),
+    ]
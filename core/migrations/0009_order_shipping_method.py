@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_product_card"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="shipping_method",
+            field=models.CharField(default="standard", max_length=20),
+        ),
+    ]
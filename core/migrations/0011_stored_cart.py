@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredCart",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cart_id", models.CharField(max_length=64, unique=True)),
+                ("items", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
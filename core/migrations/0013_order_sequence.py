@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    # Le compteur existe dès l'origine : l'allocateur n'a jamais à le créer
+    OrderSequence = apps.get_model("core", "OrderSequence")
+    OrderSequence.objects.get_or_create(name="order_number", defaults={"next_value": 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("next_value", models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:06
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Taux de secours depuis l'EUR (CurrencyConverter._get_fallback_rates)
+FALLBACK_RATES = {"EUR": Decimal("1"), "USD": Decimal("1.09"), "XOF": Decimal("655.96")}
+CENT = Decimal("0.01")
+
+
+def build_prices(apps, schema_editor):
+    # Projection initiale avec les taux enregistrés (ou de secours), remplacée
+    # au prochain rafraîchissement des taux
+    ExchangeRate = apps.get_model("core", "ExchangeRate")
+    ProductCard = apps.get_model("core", "ProductCard")
+    ProductPrice = apps.get_model("core", "ProductPrice")
+    stored = dict(
+        ExchangeRate.objects.filter(
+            base_currency__code="EUR", target_currency__code__in=FALLBACK_RATES
+        ).values_list("target_currency__code", "rate")
+    )
+    rates = {**FALLBACK_RATES, **stored} if stored else FALLBACK_RATES
+    rates["EUR"] = Decimal("1")
+    rows = [
+        ProductPrice(
+            card_id=card_id,
+            currency=code,
+            price=(price * rate).quantize(CENT),
+            effective_price=(effective_price * rate).quantize(CENT),
+            rates_version="initial",
+        )
+        for card_id, price, effective_price in ProductCard.objects.values_list(
+            "pk", "price", "effective_price"
+        )
+        for code, rate in rates.items()
+    ]
+    ProductPrice.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_order_sequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("currency", models.CharField(max_length=3)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=14)),
+                (
+                    "effective_price",
+                    models.DecimalField(decimal_places=2, max_digits=14),
+                ),
+                ("rates_version", models.CharField(max_length=50)),
+                (
+                    "card",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="prices",
+                        to="core.productcard",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["currency", "effective_price", "card"],
+                        name="price_currency_eff_idx",
+                    )
+                ],
+                "unique_together": {("card", "currency")},
+            },
+        ),
+        migrations.RunPython(build_prices, migrations.RunPython.noop),
+    ]
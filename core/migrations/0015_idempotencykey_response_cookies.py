@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_product_price"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="response_cookies",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_idempotencykey_response_cookies"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="productcard",
+            name="card_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productcard",
+            name="card_cat_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productcard",
+            name="card_type_price_idx",
+        ),
+    ]
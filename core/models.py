@@ -1,13 +1,20 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.utils import timezone
 
+from .normalization import search_key
+
 class Category(models.Model):
     """Catégorie de produits"""
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(unique=True, blank=True)
+    search_key = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -24,9 +31,110 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.search_key = search_key(self.name, 200)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'search_key'}
         super().save(*args, **kwargs)
 
 
+# Champs dont dépendent les colonnes de prix dénormalisées
+PRICING_FIELDS = {'price', 'discount_price'}
+DERIVED_PRICING_FIELDS = ['effective_price', 'discount_percent']
+
+
+def _cents(field):
+    return Cast(Round(F(field) * Value(100)), IntegerField())
+
+
+def discount_percent_expression():
+    """
+    Pourcentage de réduction en SQL, arrondi demi vers le haut comme
+    Product.discount_percentage : calcul entier en centimes, exact même sur
+    SQLite (qui stocke les montants ronds en INTEGER et les autres en REAL)
+    """
+    price, discount = _cents('price'), _cents('discount_price')
+    return (Value(200) * (price - discount) + price) / (Value(2) * price)
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet qui garde les données dérivées synchronisées lors des écritures
+    en masse, qui ne déclenchent pas les signaux post_save
+    """
+
+    def refresh_pricing(self):
+        """Recalcule les colonnes de prix dénormalisées en une seule requête UPDATE"""
+        has_discount = Q(discount_price__gt=0)
+        return super().update(
+            effective_price=Case(When(has_discount, then=F('discount_price')), default=F('price')),
+            discount_percent=Case(
+                When(has_discount & Q(price__gt=F('discount_price')),
+                     then=discount_percent_expression()),
+                default=0,
+                output_field=IntegerField(),
+            ),
+        )
+
+    def refresh_search_keys(self):
+        """Recalcule search_key (repli des accents fait en Python, sans équivalent SQL)"""
+        changed = []
+        for product in self.only('pk', 'name', 'search_key'):
+            key = search_key(product.name)
+            if product.search_key != key:
+                product.search_key = key
+                changed.append(product)
+        return super().bulk_update(changed, ['search_key']) if changed else 0
+
+    def update_stock(self, stock):
+        """
+        Met à jour le stock sans passer par products_changed (commandes) :
+        l'appelant rafraîchit les badges de stock (signals.stock_changed)
+        """
+        return super().update(stock=stock, updated_at=timezone.now())
+
+    def update(self, **kwargs):
+        # Le filtre peut porter sur les champs modifiés : on fige les lignes visées
+        pks = list(self.values_list('pk', flat=True))
+        # auto_now n'est pas appliqué par update() : updated_at sert aux GET conditionnels
+        kwargs.setdefault('updated_at', timezone.now())
+        rows = super().update(**kwargs)
+        if PRICING_FIELDS & kwargs.keys():
+            self.model._default_manager.filter(pk__in=pks).refresh_pricing()
+        _products_changed(pks, kwargs.keys())
+        return rows
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if PRICING_FIELDS & set(fields):
+            for obj in objs:
+                obj.refresh_pricing()
+            fields += [name for name in DERIVED_PRICING_FIELDS if name not in fields]
+        if 'updated_at' not in fields:
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields.append('updated_at')
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        _products_changed((obj.pk for obj in objs), fields)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.search_key = search_key(obj.name)
+            obj.refresh_pricing()
+        created = super().bulk_create(objs, *args, **kwargs)
+        _products_changed(obj.pk for obj in created if obj.pk is not None)
+        return created
+
+
+def _products_changed(product_ids, fields=None):
+    from .signals import products_changed
+    products_changed(product_ids, fields)
+
+
 class Product(models.Model):
     """Produit du site"""
     PRODUCT_TYPES = [
@@ -38,6 +146,7 @@ class Product(models.Model):
 
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
+    search_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     product_type = models.CharField(max_length=50, choices=PRODUCT_TYPES)
     description = models.TextField()
@@ -50,6 +159,10 @@ class Product(models.Model):
         blank=True,
         validators=[MinValueValidator(0)]
     )
+    # Prix réellement payé et pourcentage de réduction, dénormalisés pour
+    # pouvoir filtrer et trier en SQL (voir refresh_pricing)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    discount_percent = models.PositiveSmallIntegerField(default=0, editable=False)
     
     image = models.ImageField(upload_to='products/')
     back_image = models.ImageField(
@@ -79,6 +192,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -93,7 +208,23 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.search_key = search_key(self.name)
+        self.refresh_pricing()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Les colonnes dérivées suivent les champs dont elles dépendent
+            update_fields = set(update_fields)
+            if 'name' in update_fields:
+                update_fields.add('search_key')
+            if PRICING_FIELDS & update_fields:
+                update_fields.update(DERIVED_PRICING_FIELDS)
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+
+    def refresh_pricing(self):
+        """Recalcule effective_price et discount_percent depuis price / discount_price"""
+        self.effective_price = self.get_price
+        self.discount_percent = max(self.discount_percentage, 0)
         
         
     def get_image_url(self):
@@ -122,9 +253,11 @@ class Product(models.Model):
 
     @property
     def discount_percentage(self):
-        """Calcule le pourcentage de réduction"""
+        """Calcule le pourcentage de réduction (arrondi demi vers le haut, comme en SQL)"""
         if self.discount_price and self.price:
-            return round(((self.price - self.discount_price) / self.price) * 100)
+            price, discount = Decimal(str(self.price)), Decimal(str(self.discount_price))
+            percent = (price - discount) * 100 / price
+            return int(percent.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
         return 0
     
     @property
@@ -134,6 +267,102 @@ class Product(models.Model):
     
     
 
+class ProductCard(models.Model):
+    """
+    Fiche produit dénormalisée, lue par les pages de liste.
+    Ne contient que les produits actifs et ce qu'affiche une carte produit,
+    sans jointure ni champ texte long. Maintenue par core.cards.
+    """
+    STOCK_BADGES = [
+        ('in_stock', 'En stock'),
+        ('low_stock', 'Stock limité'),
+        ('out_of_stock', 'Rupture de stock'),
+        ('hidden', 'Stock non affiché'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    slug = models.SlugField()
+    name = models.CharField(max_length=255)
+    excerpt = models.CharField(max_length=200, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    category_name = models.CharField(max_length=200)
+    product_type = models.CharField(max_length=50, choices=Product.PRODUCT_TYPES)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percent = models.PositiveSmallIntegerField(default=0)
+    thumbnail_url = models.CharField(max_length=500)
+    back_image_url = models.CharField(max_length=500, blank=True)
+    rating = models.FloatField(default=0)
+    reviews_count = models.IntegerField(default=0)
+    in_stock = models.BooleanField(default=False)
+    stock_badge = models.CharField(max_length=20, choices=STOCK_BADGES)
+    is_featured = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Modes de tri de core.sorting, avec ou sans filtre type/catégorie
+            # (les tris et filtres de prix passent par ProductPrice).
+            # La clé primaire n'est pas un rowid SQLite : elle termine chaque
+            # index pour servir aussi le départage (tri, pk) de la pagination.
+            models.Index(fields=['created_at', 'product'], name='card_created_idx'),
+            models.Index(fields=['product_type', 'created_at', 'product'], name='card_type_created_idx'),
+            models.Index(fields=['rating', 'product'], name='card_rating_idx'),
+            models.Index(fields=['reviews_count', 'product'], name='card_popular_idx'),
+            models.Index(fields=['product_type', 'rating', 'product'], name='card_type_rating_idx'),
+            models.Index(fields=['product_type', 'reviews_count', 'product'], name='card_type_popular_idx'),
+            models.Index(fields=['is_featured', 'created_at'], name='card_featured_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def id(self):
+        return self.product_id
+
+    @property
+    def has_back_image(self):
+        return bool(self.back_image_url)
+
+
+class ProductPrice(models.Model):
+    """
+    Prix d'une carte produit dans chaque devise supportée, calculés avec un
+    instantané de taux : les listes filtrent et trient dans la devise de
+    l'acheteur sans conversion à l'affichage. Maintenu par core.price_projection.
+    """
+    card = models.ForeignKey(ProductCard, on_delete=models.CASCADE, related_name='prices')
+    currency = models.CharField(max_length=3)
+    price = models.DecimalField(max_digits=14, decimal_places=2)
+    effective_price = models.DecimalField(max_digits=14, decimal_places=2)
+    rates_version = models.CharField(max_length=50)
+
+    class Meta:
+        unique_together = ['card', 'currency']
+        indexes = [
+            # Tri et filtres de prix dans une devise (départage par carte)
+            models.Index(fields=['currency', 'effective_price', 'card'], name='price_currency_eff_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} {self.effective_price} {self.currency}"
+
+
+class ProductSearchTerm(models.Model):
+    """Index inversé utilisé pour la recherche quand FTS5 n'est pas disponible"""
+    term = models.CharField(max_length=100)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['term', 'product']
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id}"
+
+
 class ProductImage(models.Model):
     """Images supplémentaires pour les produits"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='gallery_images')
@@ -167,6 +396,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    shipping_method = models.CharField(max_length=20, default='standard')
     
     shipping_address = models.TextField()
     billing_address = models.TextField()
@@ -286,4 +516,83 @@ class UserCurrencyPreference(models.Model):
         verbose_name_plural = "Préférences de devise"
     
     def __str__(self):
-        return f"{self.user.username} - {self.preferred_currency.code if self.preferred_currency else 'None'}"
\ No newline at end of file
+        return f"{self.user.username} - {self.preferred_currency.code if self.preferred_currency else 'None'}"
+
+class IdempotencyKey(models.Model):
+    """Réponse enregistrée d'une requête POST rejouable (en-tête Idempotency-Key)"""
+    scope = models.CharField(max_length=100)
+    owner = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Vide tant que la première requête est en cours de traitement
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.TextField(blank=True)
+    # En-têtes Set-Cookie de la réponse (panier en cookie signé)
+    response_cookies = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ['scope', 'owner', 'key']
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class StoredCart(models.Model):
+    """Copie persistante d'un panier du stockage en cache (écriture différée)"""
+    cart_id = models.CharField(max_length=64, unique=True)
+    items = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.cart_id
+
+
+class Job(models.Model):
+    """Tâche de fond exécutée par la commande run_jobs (voir core/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminée'),
+        ('failed', 'Échouée'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Les tâches de priorité la plus haute passent en premier
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Une seule tâche en attente par clé (ex: recalcul de la note d'un produit)
+    dedupe_key = models.CharField(max_length=200, blank=True, db_index=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-priority', 'run_at'],
+                name='job_queue_idx',
+                condition=Q(status='queued'),
+            ),
+            models.Index(fields=['status', 'locked_at'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class OrderSequence(models.Model):
+    """Compteur des numéros de commande, réservé par blocs (voir core/order_numbers.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -0,0 +1,35 @@
+# normalization.py - Normalisation des textes du catalogue pour la recherche
+
+import re
+import unicodedata
+
+# Tout ce qui n'est ni lettre ni chiffre sépare deux termes (y compris "_" et "'")
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+
+# Borne haute pour transformer un préfixe en intervalle [prefix, prefix + PREFIX_END)
+PREFIX_END = '\uffff'
+
+
+def fold(text):
+    """Supprime les accents et passe en minuscules : 'Café Éthiopie' -> 'cafe ethiopie'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return stripped.replace('œ', 'oe').replace('æ', 'ae').lower()
+
+
+def tokenize(text):
+    """Liste des termes normalisés d'un texte"""
+    return [token for token in _SEPARATORS.split(fold(text)) if token]
+
+
+def search_key(text, max_length=255):
+    """Clé de recherche normalisée : termes repliés séparés par un espace"""
+    return ' '.join(tokenize(text))[:max_length]
+
+
+def prefix_range(field_name, prefix):
+    """
+    Filtre de préfixe sous forme d'intervalle : contrairement à LIKE,
+    il peut utiliser un index B-tree quel que soit le moteur
+    """
+    return {f'{field_name}__gte': prefix, f'{field_name}__lt': prefix + PREFIX_END}
@@ -0,0 +1,81 @@
+# order_numbers.py - Numéros de commande uniques, alloués par blocs
+
+"""
+Les numéros viennent d'un compteur unique en base (OrderSequence). Chaque
+processus réserve un bloc de ORDER_NUMBER_BLOCK_SIZE valeurs en un seul
+UPDATE atomique, puis les distribue en mémoire : une requête pour 50
+commandes au lieu d'une par commande, et aucune collision possible (deux
+blocs ne se chevauchent jamais), donc jamais de nouvel essai sur la
+contrainte d'unicité.
+
+Format : CMD-AAMMJJ-000123. La date est décorative, l'unicité vient du
+compteur. Les valeurs d'un bloc non utilisées (arrêt du processus) laissent
+des trous dans la numérotation, ce qui est sans conséquence.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderSequence
+
+SEQUENCE_NAME = 'order_number'
+DEFAULT_BLOCK_SIZE = 50
+
+
+class BlockAllocator:
+    """Distribue les valeurs d'un compteur en base, réservées par blocs"""
+
+    def __init__(self, name, block_size=None):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = os.getpid()
+
+    def _size(self):
+        return self.block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+    def _lease(self):
+        # Un bloc réservé dans une transaction annulée serait redistribué à
+        # un autre processus : la réservation doit être validée immédiatement
+        if connection.in_atomic_block:
+            raise RuntimeError('Les numéros de commande doivent être alloués hors transaction')
+        size = self._size()
+        with transaction.atomic():
+            updated = OrderSequence.objects.filter(name=self.name).update(
+                next_value=F('next_value') + size
+            )
+            if not updated:
+                raise OrderSequence.DoesNotExist(f'Compteur {self.name} absent (migration 0013)')
+            end = OrderSequence.objects.filter(name=self.name).values_list('next_value', flat=True).get()
+        self._next, self._end = end - size, end
+
+    def allocate(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processus forké : le bloc hérité appartient au parent
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._lease()
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocator = BlockAllocator(SEQUENCE_NAME)
+
+
+def format_order_number(value, date=None):
+    date = date or timezone.localdate()
+    return f'CMD-{date:%y%m%d}-{value:06d}'
+
+
+def next_order_number():
+    """Numéro de commande suivant pour ce processus"""
+    return format_order_number(_allocator.allocate())
@@ -0,0 +1,87 @@
+# orders.py - Passage de commande : réservation du stock et lignes de commande
+
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from . import signals
+from .models import Order, OrderItem, Product
+from .order_numbers import next_order_number
+
+
+class InsufficientStock(Exception):
+    """Stock insuffisant pour une ou plusieurs lignes du panier"""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        super().__init__('Stock insuffisant')
+
+
+class EmptyCart(Exception):
+    """Aucune ligne commandable dans le panier"""
+
+
+def reserve_stock(lines):
+    """
+    Décrémente le stock de toutes les lignes en une seule requête UPDATE
+    conditionnelle : chaque produit n'est mis à jour que si son stock suffit.
+    Si une ligne manque, rien n'est réservé et InsufficientStock est levée.
+    Doit être appelée dans une transaction ; les cartes et le cache ne sont
+    mis à jour qu'après sa validation.
+    """
+    quantities = {line.product.pk: line.quantity for line in lines}
+    enough_stock = reduce(or_, (Q(pk=pk, stock__gte=quantity) for pk, quantity in quantities.items()))
+    updated = Product.objects.filter(enough_stock).update_stock(
+        Case(*[When(pk=pk, then=F('stock') - quantity) for pk, quantity in quantities.items()],
+             default=F('stock'))
+    )
+    if updated != len(quantities):
+        raise InsufficientStock(_shortfalls(quantities))
+    # La commande est validée même si ce rafraîchissement échoue (erreur journalisée)
+    transaction.on_commit(lambda: signals.stock_changed(quantities), robust=True)
+
+
+def _shortfalls(quantities):
+    """Lignes dont la quantité demandée dépasse le stock courant"""
+    products = Product.objects.filter(pk__in=quantities).values('pk', 'name', 'stock')
+    return [
+        {'product_id': product['pk'], 'name': product['name'],
+         'requested': quantities[product['pk']], 'available': max(product['stock'], 0)}
+        for product in products if product['stock'] < quantities[product['pk']]
+    ]
+
+
+def place_order(user, cart, shipping_address, billing_address='',
+                payment_method='card', customer_notes=''):
+    """
+    Crée la commande d'un panier valorisé (voir cart.price_cart) : réservation
+    du stock, commande et lignes (prix figés au moment de l'achat) dans une
+    seule transaction, en un nombre de requêtes indépendant de la taille du panier
+    """
+    if cart.is_empty:
+        raise EmptyCart()
+
+    # Alloué hors transaction (voir order_numbers) ; un numéro perdu sur un rollback ne gêne pas
+    order_number = next_order_number()
+    with transaction.atomic():
+        reserve_stock(cart.lines)
+        order = Order.objects.create(
+            user=user,
+            order_number=order_number,
+            total_amount=cart.total,
+            tax_amount=cart.tax,
+            shipping_cost=cart.shipping_cost,
+            shipping_method=cart.shipping_method,
+            shipping_address=shipping_address,
+            billing_address=billing_address or shipping_address,
+            payment_method=payment_method,
+            customer_notes=customer_notes,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=line.product, quantity=line.quantity,
+                      price=line.unit_price, total=line.total)
+            for line in cart.lines
+        ])
+    return order
@@ -0,0 +1,83 @@
+# page_cache.py - Cache de pages complètes pour les visiteurs anonymes
+
+"""
+Les pages catalogue (accueil, listes, fiche produit) sont identiques pour tous
+les visiteurs anonymes, à l'exception de quelques fragments personnalisés
+(panier, devise, jeton CSRF) complétés côté navigateur par l'endpoint
+`session_fragment`. Les prix sont rendus dans la devise du visiteur (cookie),
+qui fait donc partie de la clé. Le HTML est rangé sous une clé étiquetée (cache_tags) :
+toute modification du catalogue invalide les pages concernées.
+"""
+
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import cache_tags
+from .request_currency import get_request_currency
+
+PAGE_CACHE_TIMEOUT = 300  # 5 minutes
+
+# Paramètres sans effet sur le rendu (suivi marketing), exclus de la clé
+IGNORED_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term',
+                  'utm_content', 'fbclid', 'gclid'}
+
+
+def page_key(request):
+    """
+    Clé d'une page : chemin + query string normalisée (triée, sans valeurs
+    vides) + devise du visiteur, les prix étant rendus dans cette devise
+    """
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists() if key not in IGNORED_PARAMS
+        for value in values if value != ''
+    )
+    return f'page:{get_request_currency(request).code}:{request.path}?{urlencode(params)}'
+
+
+def _is_cacheable_request(request):
+    return request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+
+
+def _is_cacheable_response(request, response):
+    # Jamais de réponse qui pose elle-même des cookies ou qui est en streaming.
+    # Le cookie CSRF n'est posé qu'ensuite par le middleware : une page qui a
+    # utilisé le jeton (get_token) embarque celui du visiteur et reste hors cache.
+    return (response.status_code == 200 and not response.streaming
+            and not response.cookies and not response.has_header('Cache-Control')
+            and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'))
+
+
+def cache_anonymous_page(tags=(cache_tags.CATALOG,), timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Sert la page depuis le cache pour les visiteurs anonymes.
+    `tags` est une liste d'étiquettes ou une fonction (request, **kwargs) -> étiquettes.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            page_tags = tags(request, **kwargs) if callable(tags) else tags
+            key = cache_tags.tagged_key(page_key(request), page_tags)
+            cached = cache.get(key)
+            if cached is not None:
+                response = HttpResponse(cached['content'], content_type=cached['content_type'])
+                response['X-Page-Cache'] = 'HIT'
+            else:
+                response = view_func(request, *args, **kwargs)
+                if _is_cacheable_response(request, response):
+                    cache.set(key, {
+                        'content': response.content,
+                        'content_type': response['Content-Type'],
+                    }, timeout)
+                    response['X-Page-Cache'] = 'MISS'
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
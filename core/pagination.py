@@ -0,0 +1,163 @@
+# pagination.py - Pagination par curseur (keyset) pour les listes de produits
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou ne correspondant pas au tri demandé"""
+
+
+@dataclass
+class Page:
+    """Une page de résultats avec ses curseurs de navigation"""
+    object_list: list
+    next_cursor: str = None
+    prev_cursor: str = None
+    sort: str = ''
+    page_size: int = 0
+    extra: dict = field(default_factory=dict)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(payload):
+    """Encode un dictionnaire en jeton opaque utilisable dans une URL"""
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Décode un jeton produit par encode_cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Curseur invalide")
+    if not isinstance(payload, dict):
+        raise InvalidCursor("Curseur invalide")
+    return payload
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur sur un ordre (champ, pk).
+
+    Le curseur contient la valeur de tri et la clé primaire de la dernière
+    (ou première) ligne affichée : la page suivante est obtenue par un WHERE
+    sur ces valeurs plutôt que par un OFFSET, ce qui rend chaque page aussi
+    coûteuse que la première.
+
+    `tiebreak` désigne la colonne de départage (pk par défaut) ; une autre
+    expression de même valeur que pk, comme la clé étrangère d'une table
+    jointe, permet à l'index de cette table de servir tout le tri.
+    """
+
+    def __init__(self, queryset, order_field, page_size=24, sort_key=None, tiebreak='pk'):
+        self.queryset = queryset
+        self.descending = order_field.startswith('-')
+        self.field = order_field.lstrip('-')
+        self.page_size = page_size
+        self.sort_key = sort_key or order_field
+        self.tiebreak = tiebreak
+
+    def _value_of(self, obj):
+        value = getattr(obj, self.field)
+        if hasattr(value, 'pk'):
+            value = value.pk
+        return value
+
+    def _to_python(self, value):
+        """Reconvertit une valeur du curseur dans le type du champ"""
+        if value is None:
+            return None
+        try:
+            model_field = self.queryset.model._meta.get_field(self.field)
+        except Exception:
+            # Champ annoté : on conserve la valeur JSON telle quelle
+            return value
+        return model_field.to_python(value)
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.field}', f'{prefix}{self.tiebreak}']
+
+    def _after(self, value, pk, reverse=False):
+        """Condition 'strictement après (value, pk)' dans le sens de lecture"""
+        descending = self.descending != reverse
+        op = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{self.field}__{op}': value}) |
+            Q(**{self.field: value, f'{self.tiebreak}__{op}': pk})
+        )
+
+    def _cursor(self, obj, direction):
+        return encode_cursor({
+            's': self.sort_key,
+            'd': direction,
+            'v': self._value_of(obj),
+            'pk': obj.pk,
+        })
+
+    def page(self, cursor=None):
+        """Retourne la page désignée par le curseur (première page si None)"""
+        direction = 'n'
+        queryset = self.queryset
+
+        if cursor:
+            payload = decode_cursor(cursor)
+            if payload.get('s') != self.sort_key or 'pk' not in payload:
+                raise InvalidCursor("Curseur incompatible avec ce tri")
+            direction = payload.get('d', 'n')
+            value = self._to_python(payload.get('v'))
+            queryset = queryset.filter(
+                self._after(value, payload['pk'], reverse=(direction == 'p'))
+            )
+
+        reverse = direction == 'p'
+        rows = list(queryset.order_by(*self._ordering(reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if reverse:
+                # On revient en arrière : il existe forcément une page suivante
+                next_cursor = self._cursor(rows[-1], 'n')
+                if has_more:
+                    prev_cursor = self._cursor(rows[0], 'p')
+            else:
+                if has_more:
+                    next_cursor = self._cursor(rows[-1], 'n')
+                if cursor:
+                    prev_cursor = self._cursor(rows[0], 'p')
+
+        return Page(
+            object_list=rows,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            sort=self.sort_key,
+            page_size=self.page_size,
+        )
@@ -0,0 +1,110 @@
+# price_format.py - Formatage des prix, un formateur précompilé par devise
+
+"""
+Chaque devise a ses règles d'affichage : position du symbole, séparateurs,
+nombre de décimales et arrondi. Le FCFA s'écrit à la française et sans
+décimales (12 500 FCFA), l'euro à la française (12 500,50 €), le dollar à
+l'américaine ($12,500.50).
+
+Les règles sont compilées une fois par devise (quantum d'arrondi, table de
+traduction des séparateurs, gabarit) et chaque formateur garde en mémoire
+les derniers montants formatés : une page qui affiche des centaines de prix
+reformate surtout les mêmes valeurs.
+
+    format_price(Decimal('12500.5'), 'XOF')  ->  '12 501 FCFA'
+"""
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+
+NBSP = '\u00a0'  # Entre le montant et le symbole (espace insécable)
+NNBSP = '\u202f'  # Séparateur des milliers en français (espace fine insécable)
+
+# Montants distincts gardés par devise
+FORMAT_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class CurrencyFormat:
+    """Règles d'affichage d'une devise"""
+    code: str
+    symbol: str
+    decimals: int = 2
+    thousands_separator: str = NNBSP
+    decimal_separator: str = ','
+    symbol_first: bool = False
+    symbol_separator: str = NBSP
+    rounding: str = ROUND_HALF_UP
+
+
+FORMATS = {
+    fmt.code: fmt for fmt in [
+        CurrencyFormat('XOF', 'FCFA', decimals=0),
+        CurrencyFormat('EUR', '€'),
+        CurrencyFormat('USD', '$', thousands_separator=',', decimal_separator='.',
+                       symbol_first=True, symbol_separator=''),
+    ]
+}
+
+
+class PriceFormatter:
+    """Formateur compilé pour une devise ; appeler avec un montant"""
+
+    def __init__(self, fmt):
+        self.format = fmt
+        self.quantum = Decimal(1).scaleb(-fmt.decimals)
+        self.scale = 10 ** fmt.decimals
+        self.thousands = str.maketrans({',': fmt.thousands_separator})
+        if fmt.symbol_first:
+            self.prefix, self.suffix = f'{fmt.symbol}{fmt.symbol_separator}', ''
+        else:
+            self.prefix, self.suffix = '', f'{fmt.symbol_separator}{fmt.symbol}'
+        self._cached = lru_cache(maxsize=FORMAT_CACHE_SIZE)(self._format)
+
+    def __call__(self, amount):
+        if amount is None:
+            return ''
+        try:
+            return self._cached(amount)
+        except TypeError:
+            # Valeur non hachable : formatée sans cache
+            return self._format(amount)
+
+    def _format(self, amount):
+        try:
+            value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+            value = value.quantize(self.quantum, rounding=self.format.rounding)
+            # Arithmétique entière : bien plus rapide que Decimal.__format__
+            units = int(value.scaleb(self.format.decimals))
+        except (InvalidOperation, ValueError):
+            # Montant invalide ou non fini (NaN) : affiché tel quel
+            return str(amount)
+        sign = '-' if units < 0 else ''
+        whole, fraction = divmod(abs(units), self.scale)
+        number = f'{whole:,}'.translate(self.thousands)
+        if self.format.decimals:
+            number = f'{number}{self.format.decimal_separator}{fraction:0{self.format.decimals}d}'
+        return f'{sign}{self.prefix}{number}{self.suffix}'
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def cache_clear(self):
+        self._cached.cache_clear()
+
+
+_formatters = {}
+
+
+def get_formatter(currency_code):
+    """Formateur de la devise (compilé au premier appel) ; devise inconnue : code après le montant"""
+    formatter = _formatters.get(currency_code)
+    if formatter is None:
+        fmt = FORMATS.get(currency_code) or CurrencyFormat(currency_code, currency_code)
+        formatter = _formatters.setdefault(currency_code, PriceFormatter(fmt))
+    return formatter
+
+
+def format_price(amount, currency_code='XOF'):
+    return get_formatter(currency_code)(amount)
@@ -0,0 +1,126 @@
+# price_projection.py - Prix des cartes produit dans chaque devise (modèle ProductPrice)
+
+"""
+Les prix sont enregistrés en EUR (CurrencyConverter.PRICE_CURRENCY). Pour
+trier et filtrer une liste dans la devise de l'acheteur, chaque carte a une
+ligne ProductPrice par devise, calculée avec un même instantané de taux :
+les listes font une jointure indexée au lieu de convertir chaque prix.
+
+- une carte créée ou modifiée : ses prix sont recalculés (cards.refresh_cards) ;
+- de nouveaux taux enregistrés : la tâche `rebuild_price_projection`
+  recalcule toute la table (mise en file par exchange_rates.refresh_rates).
+"""
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from . import cache_tags, exchange_rates
+from .models import ProductCard, ProductPrice
+
+PROJECTION_FIELDS = ['price', 'effective_price', 'rates_version']
+
+
+def _price_currency():
+    from .currency_service import CurrencyConverter
+    return CurrencyConverter.PRICE_CURRENCY
+
+
+def currencies():
+    from .currency_service import CurrencyConverter
+    return list(CurrencyConverter.SUPPORTED_CURRENCIES)
+
+
+def listing_currency(currency):
+    """Devise utilisable pour une liste (devise des prix si non projetée)"""
+    return currency if currency in currencies() else _price_currency()
+
+
+def in_currency(queryset, currency, indexed=False):
+    """
+    Cartes avec leurs prix dans `currency` (annotations display_price et
+    display_original_price).
+
+    indexed=True : jointure sur ProductPrice, pour trier ou filtrer par prix
+    avec l'index (devise, prix, carte) ; price_card sert au départage.
+    Sinon : sous-requêtes évaluées seulement pour les lignes affichées, le
+    tri reste servi par les index de ProductCard.
+    """
+    currency = listing_currency(currency)
+    if indexed:
+        return queryset.filter(prices__currency=currency).annotate(
+            display_price=F('prices__effective_price'),
+            display_original_price=F('prices__price'),
+            price_card=F('prices__card'),
+        )
+    prices = ProductPrice.objects.filter(card=OuterRef('pk'), currency=currency)
+    amount = ProductPrice._meta.get_field('price')
+    return queryset.annotate(
+        display_price=Subquery(prices.values('effective_price')[:1], output_field=amount),
+        display_original_price=Subquery(prices.values('price')[:1], output_field=amount),
+    )
+
+
+def _build(rows, matrix):
+    """Lignes ProductPrice de cartes (pk, price, effective_price) dans chaque devise"""
+    rows = list(rows)
+    source = _price_currency()
+    prices = []
+    for currency in currencies():
+        if (source, currency) not in matrix.rates:
+            # Devise absente de l'instantané : ses prix restent ceux du précédent
+            continue
+        converted = matrix.convert_many([price for _, price, _ in rows], source, currency)
+        effective = matrix.convert_many([effective for _, _, effective in rows], source, currency)
+        prices += [
+            ProductPrice(card_id=card_id, currency=currency, price=price,
+                         effective_price=effective_price, rates_version=matrix.version)
+            for (card_id, _, _), price, effective_price in zip(rows, converted, effective)
+        ]
+    return prices
+
+
+def _upsert(prices):
+    ProductPrice.objects.bulk_create(
+        prices,
+        update_conflicts=True,
+        unique_fields=['card', 'currency'],
+        update_fields=PROJECTION_FIELDS,
+    )
+
+
+def refresh_prices(product_ids):
+    """Recalcule les prix de quelques cartes avec la matrice courante"""
+    rows = ProductCard.objects.filter(pk__in=product_ids).values_list('pk', 'price', 'effective_price')
+    _upsert(_build(rows, exchange_rates.get_matrix()))
+
+
+def snapshot():
+    """Dernier instantané enregistré (sans le cache du processus), ou les taux de secours"""
+    return exchange_rates.load_matrix() or exchange_rates._fallback_matrix()
+
+
+def rebuild_prices(matrix=None, batch_size=500):
+    """
+    Recalcule toute la projection avec un même instantané, retourne le nombre
+    de lignes. Une transaction par lot : le verrou d'écriture n'est jamais
+    gardé pendant toute la reconstruction.
+    """
+    matrix = matrix or snapshot()
+    count = 0
+    cards = ProductCard.objects.order_by('pk').values_list('pk', 'price', 'effective_price')
+    # Lots lus par clé (pas de curseur ouvert pendant les écritures)
+    batch = list(cards[:batch_size])
+    while batch:
+        count += _rebuild_batch(batch, matrix)
+        batch = list(cards.filter(pk__gt=batch[-1][0])[:batch_size])
+    ProductPrice.objects.exclude(currency__in=currencies()).delete()
+    # Les pages de liste affichent ces prix
+    cache_tags.bump(cache_tags.CATALOG)
+    return count
+
+
+def _rebuild_batch(rows, matrix):
+    prices = _build(rows, matrix)
+    with transaction.atomic():
+        _upsert(prices)
+    return len(prices)
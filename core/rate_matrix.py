@@ -0,0 +1,66 @@
+# rate_matrix.py - Matrice de taux croisés calculée depuis une devise pivot
+
+"""
+Une seule série de taux (celle de la devise pivot) suffit à dériver tous les
+taux croisés : taux(a -> b) = taux(pivot -> b) / taux(pivot -> a). Les taux
+sont des Decimal calculés une fois, à la construction de la matrice ; une
+conversion n'est plus qu'une recherche dans un dict et une multiplication.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal, localcontext
+
+# Précision des taux croisés (les montants sont arrondis au centime)
+RATE_QUANTUM = Decimal('1e-12')
+CENT = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class RateMatrix:
+    """Taux de conversion entre toutes les devises supportées"""
+    pivot: str
+    rates: dict = field(repr=False)
+    updated_at: object = None
+    version: str = ''
+    stale: bool = False
+    fallback: bool = False
+
+    @classmethod
+    def from_pivot(cls, pivot, pivot_rates, **kwargs):
+        """
+        Construit la matrice depuis les taux {code: Decimal} de la devise pivot
+        (le taux du pivot vers lui-même vaut 1)
+        """
+        pivot_rates = {code: Decimal(rate) for code, rate in pivot_rates.items() if Decimal(rate) > 0}
+        pivot_rates[pivot] = Decimal(1)
+        rates = {}
+        with localcontext() as context:
+            context.prec = 28
+            for source, source_rate in pivot_rates.items():
+                for target, target_rate in pivot_rates.items():
+                    rate = Decimal(1) if source == target else target_rate / source_rate
+                    rates[(source, target)] = rate.quantize(RATE_QUANTUM)
+        return cls(pivot=pivot, rates=rates, **kwargs)
+
+    @property
+    def currencies(self):
+        return sorted({source for source, _ in self.rates})
+
+    def rate(self, source, target):
+        try:
+            return self.rates[(source, target)]
+        except KeyError:
+            raise ValueError(f"Devise {target if (source, source) in self.rates else source} non supportée")
+
+    def convert(self, amount, source, target):
+        """Montant (Decimal) converti et arrondi au centime"""
+        return (amount * self.rate(source, target)).quantize(CENT)
+
+    def convert_many(self, amounts, source, target):
+        """Montants (Decimal) convertis avec un seul taux, arrondis au centime"""
+        rate = self.rate(source, target)
+        return [(amount * rate).quantize(CENT) for amount in amounts]
+
+    def rates_from(self, base):
+        """Taux {code: Decimal} depuis une devise de base"""
+        return {target: rate for (source, target), rate in self.rates.items() if source == base}
@@ -0,0 +1,230 @@
+# rate_provider.py - Client HTTP de l'API de taux : connexions réutilisées, disjoncteur, métriques
+
+"""
+Un client par processus (get_client()) garde une requests.Session et son
+pool de connexions : pas de nouvelle poignée de main TCP/TLS à chaque
+rafraîchissement. Les délais sont séparés (connexion courte, lecture plus
+longue) au lieu d'un délai unique de 10 secondes.
+
+Le disjoncteur s'ouvre après BREAKER_FAILURES échecs consécutifs : pendant
+BREAKER_RESET secondes les appels échouent immédiatement (ProviderUnavailable)
+et les taux enregistrés, ou ceux de secours, continuent d'être servis
+(exchange_rates.get_matrix). Ensuite un seul appel d'essai est laissé passer
+(demi-ouvert) : un succès referme le disjoncteur, un échec le rouvre.
+
+Les métriques (appels, échecs, latences, état du disjoncteur) sont celles du
+processus ; un résumé est copié dans le cache après chaque appel pour être lu
+depuis un autre processus (last_metrics()).
+
+Réglages dans CURRENCY_SETTINGS : API_CONNECT_TIMEOUT, API_READ_TIMEOUT,
+BREAKER_FAILURES, BREAKER_RESET.
+"""
+
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 5
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_RESET = 60
+POOL_SIZE = 4
+METRICS_CACHE_KEY = 'exchange_rate_provider_metrics'
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class ProviderUnavailable(Exception):
+    """Disjoncteur ouvert : l'API n'est pas appelée"""
+
+
+def _setting(name, default):
+    return getattr(settings, 'CURRENCY_SETTINGS', {}).get(name, default)
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états, partagé par les threads du processus"""
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """True si l'appel peut partir ; un seul appel d'essai en demi-ouvert"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self.clock() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._state = HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning("API de taux : disjoncteur ouvert après %s échec(s)", self._failures)
+                self._state = OPEN
+                self._opened_at = self.clock()
+
+
+class ProviderMetrics:
+    """Compteurs et latences des appels à l'API, pour ce processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = self.failures = self.short_circuits = 0
+        self.latency_total = self.latency_max = self.latency_last = 0.0
+
+    def record_call(self, latency, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def record_short_circuit(self):
+        with self._lock:
+            self.short_circuits += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'short_circuits': self.short_circuits,
+                'latency_avg_ms': round(1000 * self.latency_total / self.calls, 1) if self.calls else None,
+                'latency_max_ms': round(1000 * self.latency_max, 1),
+                'latency_last_ms': round(1000 * self.latency_last, 1),
+            }
+
+
+def _parse_rates(payload, codes):
+    """
+    Taux {code: Decimal} d'une réponse de l'API, limités à `codes`.
+    Toute réponse mal formée lève ValueError : c'est un échec comme un autre
+    pour le disjoncteur et pour exchange_rates.refresh_rates.
+    """
+    rates = payload.get('rates') if isinstance(payload, dict) else None
+    if not isinstance(rates, dict):
+        raise ValueError("API de taux : réponse sans table 'rates'")
+    result = {}
+    for code in codes:
+        if code not in rates:
+            continue
+        try:
+            rate = Decimal(str(rates[code]))
+        except ArithmeticError:
+            rate = None
+        if rate is None or not rate.is_finite() or rate <= 0:
+            raise ValueError(f"API de taux : taux invalide pour {code} ({rates[code]!r})")
+        result[code] = rate
+    return result
+
+
+class RateProviderClient:
+    """Appels à l'API de taux avec une session réutilisée et un disjoncteur"""
+
+    def __init__(self, base_url, connect_timeout=None, read_timeout=None,
+                 failure_threshold=None, reset_timeout=None):
+        self.base_url = base_url
+        self.timeout = (
+            connect_timeout or _setting('API_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+            read_timeout or _setting('API_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold or _setting('BREAKER_FAILURES', DEFAULT_BREAKER_FAILURES),
+            reset_timeout or _setting('BREAKER_RESET', DEFAULT_BREAKER_RESET),
+        )
+        self.metrics = ProviderMetrics()
+        self.session = requests.Session()
+        # Pas de nouvel essai automatique : le disjoncteur décide
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def total_timeout(self):
+        return sum(self.timeout)
+
+    def fetch(self, base, codes):
+        """Taux {code: Decimal} depuis `base`, limités à `codes`"""
+        if not self.breaker.allow():
+            self.metrics.record_short_circuit()
+            self._publish()
+            raise ProviderUnavailable(f"API de taux indisponible (disjoncteur {self.breaker.state})")
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f'{self.base_url}{base}', timeout=self.timeout)
+            response.raise_for_status()
+            result = _parse_rates(response.json(), codes)
+        except (requests.exceptions.RequestException, ValueError):
+            self.metrics.record_call(time.perf_counter() - started, ok=False)
+            self.breaker.record_failure()
+            self._publish()
+            raise
+        self.metrics.record_call(time.perf_counter() - started, ok=True)
+        self.breaker.record_success()
+        self._publish()
+        return result
+
+    def status(self):
+        return {'url': self.base_url, 'breaker': self.breaker.state, **self.metrics.snapshot()}
+
+    def _publish(self):
+        cache.set(METRICS_CACHE_KEY, {**self.status(), 'pid': os.getpid()}, None)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url):
+    """Client du processus pour cette URL (recréé après un fork : la session n'est pas partageable)"""
+    key = (os.getpid(), base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = RateProviderClient(base_url)
+        return client
+
+
+def last_metrics():
+    """Dernières métriques publiées par le processus qui a appelé l'API"""
+    return cache.get(METRICS_CACHE_KEY)
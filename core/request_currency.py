@@ -0,0 +1,117 @@
+# request_currency.py - Devise de l'acheteur, résolue une fois par requête
+
+"""
+CurrencyMiddleware pose request.currency, un objet paresseux (comme
+request.user) : rien n'est lu avant le premier accès, puis la valeur est
+réutilisée par les vues, les templates, les tags et les API de la requête.
+
+Ordre de résolution : préférence de l'utilisateur connecté (une requête),
+session, cookie `currency`, puis CURRENCY_SETTINGS['DEFAULT_CURRENCY'].
+"""
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserCurrencyPreference
+
+SESSION_KEY = 'currency'
+COOKIE_NAME = 'currency'
+COOKIE_MAX_AGE = 365 * 24 * 3600
+
+
+def supported_currencies():
+    from .currency_service import CurrencyConverter
+    return CurrencyConverter.SUPPORTED_CURRENCIES
+
+
+def default_currency():
+    return getattr(settings, 'CURRENCY_SETTINGS', {}).get('DEFAULT_CURRENCY', 'XOF')
+
+
+@dataclass(frozen=True)
+class ShopperCurrency:
+    """Devise résolue et provenance (preference, session, cookie ou default)"""
+    code: str
+    source: str = 'default'
+
+    @property
+    def info(self):
+        return supported_currencies().get(self.code, {})
+
+    @property
+    def symbol(self):
+        return self.info.get('symbol', self.code)
+
+    @property
+    def name(self):
+        return self.info.get('name', self.code)
+
+    @property
+    def flag(self):
+        return self.info.get('flag', '')
+
+    def __str__(self):
+        return self.code
+
+
+def _valid(code):
+    return code if code in supported_currencies() else None
+
+
+def preferred_currency_code(user):
+    """Code de la devise préférée d'un utilisateur connecté, ou None (une seule requête)"""
+    if not user.is_authenticated:
+        return None
+    return (
+        UserCurrencyPreference.objects.filter(user_id=user.pk)
+        .values_list('preferred_currency__code', flat=True)
+        .first()
+    )
+
+
+def resolve_currency(request):
+    user = getattr(request, 'user', None)
+    if user is not None:
+        code = _valid(preferred_currency_code(user))
+        if code:
+            return ShopperCurrency(code, 'preference')
+    session = getattr(request, 'session', None)
+    if session is not None:
+        code = _valid(session.get(SESSION_KEY))
+        if code:
+            return ShopperCurrency(code, 'session')
+    code = _valid(request.COOKIES.get(COOKIE_NAME))
+    if code:
+        return ShopperCurrency(code, 'cookie')
+    return ShopperCurrency(default_currency())
+
+
+def get_request_currency(request):
+    """request.currency, ou une résolution directe hors middleware (tests, rendu sans requête)"""
+    if request is None:
+        return ShopperCurrency(default_currency())
+    currency = getattr(request, 'currency', None)
+    if currency is None:
+        currency = request.currency = SimpleLazyObject(lambda: resolve_currency(request))
+    return currency
+
+
+def remember_currency(request, response, code):
+    """Enregistre le choix d'un visiteur (session si elle existe déjà, et cookie)"""
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        session[SESSION_KEY] = code
+    response.set_cookie(COOKIE_NAME, code, max_age=COOKIE_MAX_AGE, samesite='Lax')
+
+
+class CurrencyMiddleware:
+    """Pose request.currency, résolu au premier accès seulement"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.currency = SimpleLazyObject(lambda: resolve_currency(request))
+        return self.get_response(request)
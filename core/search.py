@@ -0,0 +1,224 @@
+# search.py - Index de recherche plein texte des produits
+
+from django.db import connection, transaction
+from django.db.models import (Case, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductSearchTerm
+from .normalization import fold, prefix_range, search_key
+from .normalization import tokenize as normalized_tokens
+
+FTS_TABLE = 'core_product_fts'
+
+# Poids de chaque colonne dans le classement (nom > catégorie > descriptions)
+FIELD_WEIGHTS = {
+    'name': 10,
+    'category_name': 5,
+    'description': 2,
+    'detailed_description': 1,
+}
+
+# Nombre maximum d'ids renvoyés par search_product_ids
+MAX_RESULTS = 500
+
+# Retranché du score des produits dont le nom commence par la requête
+LEADING_BONUS = 1e9
+
+# Champs de Product dont dépend l'index
+INDEXED_FIELDS = {'name', 'category', 'category_id', 'description', 'detailed_description'}
+
+
+def tokenize(text):
+    """Découpe un texte en termes indexables (sans accents, en minuscules)"""
+    return [token for token in normalized_tokens(text) if len(token) > 1]
+
+
+def uses_fts():
+    """FTS5 est utilisé sur SQLite, l'index inversé sur les autres bases"""
+    return connection.vendor == 'sqlite'
+
+
+FTS_INSERT = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, category_name, description, detailed_description) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+
+
+def _document(product):
+    """Colonnes indexées d'un produit, accents repliés comme les requêtes"""
+    return {
+        'name': fold(product.name),
+        'category_name': fold(product.category.name) if product.category_id else '',
+        'description': fold(product.description),
+        'detailed_description': fold(product.detailed_description),
+    }
+
+
+def _fts_row(product):
+    document = _document(product)
+    return [product.pk, document['name'], document['category_name'],
+            document['description'], document['detailed_description']]
+
+
+def index_product(product):
+    """Ajoute ou met à jour un produit dans l'index"""
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(FTS_INSERT, _fts_row(product))
+        return
+
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id=product.pk).delete()
+        ProductSearchTerm.objects.bulk_create(_terms(product))
+
+
+def _terms(product):
+    """Lignes de l'index inversé d'un produit, un poids cumulé par terme"""
+    weights = {}
+    for column, text in _document(product).items():
+        for term in tokenize(text):
+            weights[term[:100]] = weights.get(term[:100], 0) + FIELD_WEIGHTS[column]
+    return [ProductSearchTerm(term=term, product_id=product.pk, weight=weight)
+            for term, weight in weights.items()]
+
+
+def index_products(product_ids):
+    """Réindexe un ensemble de produits (écritures en masse), en quelques requêtes"""
+    product_ids = set(product_ids)
+    products = Product.objects.filter(pk__in=product_ids).select_related('category')
+    if not uses_fts():
+        terms = [term for product in products for term in _terms(product)]
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id__in=product_ids).delete()
+            ProductSearchTerm.objects.bulk_create(terms, batch_size=500)
+        return
+    rows = [_fts_row(product) for product in products]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[pk] for pk in product_ids])
+        cursor.executemany(FTS_INSERT, rows)
+
+
+def remove_product(product_id):
+    """Retire un produit de l'index"""
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+    else:
+        ProductSearchTerm.objects.filter(product_id=product_id).delete()
+
+
+def rebuild_index():
+    """Reconstruit entièrement l'index, retourne le nombre de produits indexés"""
+    products = Product.objects.select_related('category').iterator(chunk_size=500)
+    count = 0
+    if uses_fts():
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch = []
+            for product in products:
+                batch.append(_fts_row(product))
+                if len(batch) >= 500:
+                    cursor.executemany(FTS_INSERT, batch)
+                    count += len(batch)
+                    batch = []
+            cursor.executemany(FTS_INSERT, batch)
+            count += len(batch)
+        return count
+
+    with transaction.atomic():
+        ProductSearchTerm.objects.all().delete()
+        batch = []
+        for product in products:
+            batch += _terms(product)
+            count += 1
+            if len(batch) >= 500:
+                ProductSearchTerm.objects.bulk_create(batch)
+                batch = []
+        ProductSearchTerm.objects.bulk_create(batch)
+    return count
+
+
+def _fts_match(tokens):
+    # Chaque terme est cité (pas d'opérateurs FTS injectés) et cherché en préfixe
+    return ' '.join('"%s"*' % token.replace('"', '') for token in tokens)
+
+
+def search_product_ids(query, limit=MAX_RESULTS):
+    """
+    Retourne les ids des produits correspondant à la requête,
+    du plus pertinent au moins pertinent
+    """
+    products = search_products(Product.objects.all(), query).order_by('search_rank', 'pk')
+    return list(products.values_list('pk', flat=True)[:limit])
+
+
+def _fts_search(queryset, tokens):
+    """
+    Jointure sur la table FTS5 (une seule requête plein texte) ; le score
+    bm25 de la ligne jointe est annoté (plus bas = meilleur)
+    """
+    model = queryset.model
+    outer_pk = f'{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(model._meta.pk.column)}'
+    weights = ', '.join(str(FIELD_WEIGHTS[c]) for c in
+                        ('name', 'category_name', 'description', 'detailed_description'))
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        # `+` : le rowid FTS n'est pas utilisable comme contrainte, SQLite lit donc la
+        # table FTS en premier (une requête plein texte) puis chaque ligne par sa clé
+        where=[f'+{FTS_TABLE}.rowid = {outer_pk}', f'{FTS_TABLE} MATCH %s'],
+        params=[_fts_match(tokens)],
+    )
+    return queryset, RawSQL(f'bm25({FTS_TABLE}, {weights})', [], output_field=FloatField())
+
+
+def _terms_filter_and_score(tokens):
+    """Index inversé : tous les termes doivent correspondre (en préfixe), score = somme des poids"""
+    matches = {
+        f'match_{i}': Max(Case(When(Q(**prefix_range('term', token)), then=Value(1)),
+                               default=Value(0), output_field=IntegerField()))
+        for i, token in enumerate(tokens)
+    }
+    condition = Q()
+    for token in tokens:
+        condition |= Q(**prefix_range('term', token))
+    terms = ProductSearchTerm.objects.filter(condition)
+    matched = (
+        terms.values('product_id')
+        .annotate(**matches)
+        .filter(**{name: 1 for name in matches})
+        .values('product_id')
+    )
+    total = Subquery(
+        terms.filter(product_id=OuterRef('pk')).values('product_id')
+        .annotate(total=Sum('weight')).values('total'),
+        output_field=FloatField(),
+    )
+    return matched, total * Value(-1.0)
+
+
+def search_products(queryset, query):
+    """
+    Restreint un queryset de produits (Product ou ProductCard) aux résultats
+    de la recherche et l'annote avec `search_rank` (plus bas = plus pertinent).
+    Tout est fait en SQL : les filtres ajoutés ensuite (catégorie, prix...)
+    s'appliquent à tous les résultats, sans limite préalable.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if uses_fts():
+        queryset, score = _fts_search(queryset, tokens)
+    else:
+        matched, score = _terms_filter_and_score(tokens)
+        queryset = queryset.filter(pk__in=matched)
+    # Les produits dont le nom commence par la requête passent en tête
+    # (intervalle sur la colonne indexée search_key)
+    leading = Product.objects.filter(**prefix_range('search_key', search_key(query))).values('pk')
+    rank = Case(
+        When(pk__in=leading, then=score - Value(LEADING_BONUS)),
+        default=score,
+        output_field=FloatField(),
+    )
+    return queryset.annotate(search_rank=rank)
@@ -0,0 +1,97 @@
+# signals.py - Synchronisation des données dérivées du catalogue
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache_tags, cards, jobs, search
+from .models import Category, Product, ProductImage, Review
+
+
+def products_changed(product_ids, fields=None):
+    """
+    Appelé par ProductQuerySet après update() / bulk_update() / bulk_create(),
+    qui contournent post_save ; fields : champs modifiés (None : tous)
+    """
+    product_ids = set(product_ids)
+    if fields is not None and 'name' in fields:
+        Product.objects.filter(pk__in=product_ids).refresh_search_keys()
+    if fields is None or search.INDEXED_FIELDS & set(fields):
+        search.index_products(product_ids)
+    cards.refresh_cards(product_ids)
+    cache_tags.bump(cache_tags.CATALOG, *[cache_tags.product_tag(pk) for pk in product_ids])
+
+
+def stock_changed(product_ids):
+    """
+    Appelé après une réservation de stock : seules les fiches des produits
+    sont invalidées, les listes seulement si un badge de stock a changé
+    """
+    product_ids = set(product_ids)
+    tags = [cache_tags.product_tag(pk) for pk in product_ids]
+    if cards.refresh_stock(product_ids):
+        tags.append(cache_tags.CATALOG)
+    cache_tags.bump(*tags)
+
+
+def _bump_product(product):
+    cache_tags.bump(
+        cache_tags.CATALOG,
+        cache_tags.product_tag(product.pk),
+        cache_tags.category_tag(product.category_id),
+    )
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    """Met à jour l'index de recherche et la carte après l'enregistrement d'un produit"""
+    if raw:
+        return
+    search.index_product(instance)
+    cards.refresh_cards([instance.pk])
+    _bump_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    """Retire un produit supprimé de l'index de recherche"""
+    search.remove_product(instance.pk)
+    _bump_product(instance)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, raw=False, **kwargs):
+    """Le nom de catégorie est indexé et dénormalisé : on propage le changement"""
+    if raw:
+        return
+    search.index_products(instance.products.values_list('pk', flat=True))
+    cards.refresh_category(instance)
+    cache_tags.bump(cache_tags.CATALOG, cache_tags.category_tag(instance.pk))
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_deleted_category(sender, instance, **kwargs):
+    cache_tags.bump(cache_tags.CATALOG, cache_tags.category_tag(instance.pk))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_gallery(sender, instance, raw=False, **kwargs):
+    """La galerie fait partie de la fiche produit"""
+    if raw:
+        return
+    cache_tags.bump(cache_tags.product_tag(instance.product_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_reviewed_product(sender, instance, raw=False, **kwargs):
+    """
+    Un avis modifie la note et le nombre d'avis affichés sur la carte :
+    le recalcul est confié à la file de tâches, la liste des avis est
+    invalidée immédiatement
+    """
+    if raw:
+        return
+    jobs.enqueue('refresh_product_rating', {'product_id': instance.product_id},
+                 dedupe_key=f'refresh_product_rating:{instance.product_id}')
+    cache_tags.bump(cache_tags.reviews_tag(instance.product_id))
@@ -0,0 +1,110 @@
+# single_flight.py - Un seul calcul à la fois pour une même clé, entre threads et processus
+
+"""
+    with single_flight('exchange_rates_refresh') as leader:
+        if leader:
+            ...  # seul ce appelant fait le travail
+        else:
+            ...  # les autres utilisent la dernière valeur connue
+
+Un verrou par clé dans le processus (threads), puis un verrou entre
+processus :
+
+- cache partagé (Redis, Memcached, base de données) : cache.add(), atomique,
+  qui expire après `ttl` secondes si son détenteur meurt ;
+- cache local au processus (LocMemCache) : verrou de fichier fcntl.flock()
+  dans SINGLE_FLIGHT_LOCK_DIR, partagé par les processus d'une même machine
+  et libéré par le système à la mort du détenteur. Sans fcntl (Windows), le
+  verrou reste local au processus.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Caches dont le contenu n'est pas vu par les autres processus
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_local_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _local_lock(key):
+    with _registry_lock:
+        return _local_locks.setdefault(key, threading.Lock())
+
+
+def _cache_is_shared():
+    return settings.CACHES.get('default', {}).get('BACKEND') not in LOCAL_CACHE_BACKENDS
+
+
+def lock_dir():
+    path = getattr(settings, 'SINGLE_FLIGHT_LOCK_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'single_flight')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def _file_lock(key):
+    name = hashlib.sha1(key.encode()).hexdigest()
+    fd = os.open(os.path.join(lock_dir(), f'{name}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _cache_lock(key, ttl):
+    cache_key = f'single_flight:{key}'
+    token = uuid.uuid4().hex
+    if not cache.add(cache_key, token, ttl):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        # Ne pas libérer un verrou expiré puis repris par un autre processus
+        if cache.get(cache_key) == token:
+            cache.delete(cache_key)
+
+
+@contextmanager
+def single_flight(key, ttl=60):
+    """Produit True pour l'appelant qui obtient le verrou, False pour les autres (sans attendre)"""
+    local = _local_lock(key)
+    if not local.acquire(blocking=False):
+        yield False
+        return
+    try:
+        if fcntl is not None and not _cache_is_shared():
+            shared_lock = _file_lock(key)
+        else:
+            shared_lock = _cache_lock(key, ttl)
+        with shared_lock as leader:
+            yield leader
+    finally:
+        local.release()
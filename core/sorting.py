@@ -0,0 +1,75 @@
+# sorting.py - Modes de tri autorisés pour les listes de produits
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SortMode:
+    """Un tri déclaré : clé d'URL, libellé et colonne (ou annotation) de tri"""
+    key: str
+    label: str
+    order_field: str
+    annotation: object = None
+    # Colonne de départage de la pagination (voir KeysetPaginator)
+    tiebreak: str = 'pk'
+
+    def apply(self, queryset):
+        """Annote le queryset si besoin et retourne le champ de tri à utiliser"""
+        if self.annotation is not None:
+            field_name = self.order_field.lstrip('-')
+            queryset = queryset.annotate(**{field_name: self.annotation()})
+        return queryset, self.order_field
+
+
+SORT_MODES = {
+    mode.key: mode for mode in [
+        SortMode('newest', 'Récents', '-created_at'),
+        # Prix dans la devise de l'acheteur (annotations de price_projection.in_currency)
+        SortMode('price_asc', 'Prix croissant', 'display_price', tiebreak='price_card'),
+        SortMode('price_desc', 'Prix décroissant', '-display_price', tiebreak='price_card'),
+        SortMode('rating', 'Les mieux notés', '-rating'),
+        SortMode('popularity', 'Les plus populaires', '-reviews_count'),
+    ]
+}
+
+DEFAULT_SORT = 'newest'
+
+# Tri par pertinence, disponible uniquement sur une recherche (annotation search_rank)
+RELEVANCE_SORT = SortMode('relevance', 'Pertinence', 'search_rank')
+
+# Anciennes valeurs du paramètre ?sort (liens existants, favoris)
+LEGACY_SORTS = {
+    '-created_at': 'newest',
+    'price': 'price_asc',
+    '-price': 'price_desc',
+    '-rating': 'rating',
+    '-reviews_count': 'popularity',
+}
+
+
+def resolve_sort(key, queryset):
+    """
+    Retourne le SortMode demandé ; une valeur inconnue retombe sur le tri
+    par défaut au lieu de trier sur une colonne arbitraire
+    """
+    searching = 'search_rank' in queryset.query.annotations
+    key = LEGACY_SORTS.get(key, key)
+    if key == RELEVANCE_SORT.key and searching:
+        return RELEVANCE_SORT
+    if key in SORT_MODES:
+        return SORT_MODES[key]
+    return RELEVANCE_SORT if searching else SORT_MODES[DEFAULT_SORT]
+
+
+def sorts_by_price(key):
+    """Le tri demandé porte-t-il sur le prix (jointure sur la projection des prix)"""
+    mode = SORT_MODES.get(LEGACY_SORTS.get(key, key))
+    return mode is not None and mode.tiebreak == 'price_card'
+
+
+def sort_choices(searching=False):
+    """Liste (clé, libellé) pour le sélecteur de tri des templates"""
+    modes = list(SORT_MODES.values())
+    if searching:
+        modes.insert(0, RELEVANCE_SORT)
+    return [(mode.key, mode.label) for mode in modes]
@@ -0,0 +1,67 @@
+# tasks.py - Tâches de fond du site (exécutées par `manage.py run_jobs`)
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from . import cards, exchange_rates, idempotency, jobs, price_projection
+from .models import Order
+from .single_flight import single_flight
+
+
+@jobs.job(name='send_order_confirmation', priority=10)
+def send_order_confirmation(order_id):
+    """Email de confirmation envoyé après le paiement"""
+    order = Order.objects.select_related('user').prefetch_related('items__product').get(pk=order_id)
+    if not order.user.email:
+        return
+    lines = [f"- {item.quantity} x {item.product.name} : {item.total}€" for item in order.items.all()]
+    body = '\n'.join([
+        f"Bonjour {order.user.first_name or order.user.username},",
+        '',
+        f"Merci pour votre commande {order.order_number}.",
+        '',
+        *lines,
+        '',
+        f"Livraison : {order.shipping_cost}€",
+        f"TVA : {order.tax_amount}€",
+        f"Total : {order.total_amount}€",
+        '',
+        "L'équipe Obidon",
+    ])
+    send_mail(f"Confirmation de votre commande {order.order_number}", body,
+              settings.DEFAULT_FROM_EMAIL, [order.user.email])
+
+
+@jobs.job(name='refresh_product_rating', priority=5)
+def refresh_product_rating(product_id):
+    """Recalcule note moyenne et nombre d'avis après un avis ajouté ou supprimé"""
+    cards.refresh_product_rating(product_id)
+
+
+@jobs.job(name='refresh_exchange_rates', priority=5, max_attempts=3)
+def refresh_exchange_rates():
+    """Taux de la devise pivot depuis l'API, taux croisés enregistrés dans ExchangeRate"""
+    exchange_rates.refresh_rates()
+
+
+@jobs.job(name='rebuild_price_projection', priority=5, atomic=False)
+def rebuild_price_projection():
+    """Prix des cartes dans chaque devise, avec les derniers taux enregistrés"""
+    with single_flight('rebuild_price_projection', ttl=600) as leader:
+        if not leader:
+            # Une reconstruction tourne déjà, peut-être avec des taux plus anciens :
+            # nouvel essai plus tard plutôt que deux écritures concurrentes
+            raise RuntimeError("Reconstruction des prix déjà en cours")
+        price_projection.rebuild_prices()
+
+
+@jobs.job(name='purge_idempotency_keys', every=timedelta(hours=1))
+def purge_idempotency_keys():
+    idempotency.purge_expired()
+
+
+@jobs.job(name='purge_finished_jobs', every=timedelta(days=1))
+def purge_finished_jobs():
+    jobs.purge_finished()
@@ -3,7 +3,9 @@
 
 from django import template
 from django.utils.safestring import mark_safe
-from ..currency_service import CurrencyConverter, get_user_currency
+from ..currency_service import CurrencyConverter
+from ..price_format import format_price
+from ..request_currency import get_request_currency
 
 register = template.Library()
 
@@ -13,10 +15,8 @@ def convert_price(context, amount, from_currency='EUR'):
     Convertit un prix dans la devise de l'utilisateur
     Usage: {% convert_price 50 'EUR' %}
     """
-    request = context.get('request')
-    user = request.user if request else None
-    
-    to_currency = get_user_currency(user)
+    # Devise résolue une fois pour toute la requête (CurrencyMiddleware)
+    to_currency = get_request_currency(context.get('request')).code
     
     try:
         result = CurrencyConverter.convert_price(amount, from_currency, to_currency)
@@ -30,10 +30,8 @@ def price_tag(context, amount, from_currency='EUR'):
     Génère un span HTML avec conversion automatique côté client
     Usage: {% price_tag 50 'EUR' %}
     """
-    request = context.get('request')
-    user = request.user if request else None
-    
-    to_currency = get_user_currency(user)
+    # Devise résolue une fois pour toute la requête (CurrencyMiddleware)
+    to_currency = get_request_currency(context.get('request')).code
     
     try:
         result = CurrencyConverter.convert_price(amount, from_currency, to_currency)
@@ -54,10 +52,7 @@ def currency_symbol(currency_code):
 @register.filter
 def format_currency(amount, currency_code='XOF'):
     """
-    Formate un montant avec le symbole de devise
+    Formate un montant selon les règles de la devise (formateur précompilé)
     Usage: {{ 50000|format_currency:'XOF' }}
     """
-    currencies = CurrencyConverter.SUPPORTED_CURRENCIES
-    symbol = currencies.get(currency_code, {}).get('symbol', currency_code)
-    formatted_amount = f"{amount:,.2f}"
-    return f"{symbol} {formatted_amount}"
\ No newline at end of file
+    return format_price(amount, currency_code)
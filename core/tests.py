@@ -0,0 +1,706 @@
+import json
+import multiprocessing
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+from unittest import mock, skipIf
+
+import requests
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import cache_tags, exchange_rates, jobs, page_cache, price_projection, rate_provider, search, single_flight
+from .cart import price_cart
+from .cart_storage import finalize_cart, load_cart, save_cart
+from .management.commands.exchange_rate_stub_server import StubHandler
+from .models import Category, IdempotencyKey, Job, OrderSequence, Product, ProductCard
+from .order_numbers import SEQUENCE_NAME, BlockAllocator
+from .orders import InsufficientStock, place_order, reserve_stock
+from .pagination import KeysetPaginator
+from .price_format import format_price
+from .rate_provider import RateProviderClient
+from .sorting import SORT_MODES, sorts_by_price
+
+
+def make_products(category, names, **fields):
+    return Product.objects.bulk_create([
+        Product(name=name, slug=slugify(name), category=category, product_type='cafe',
+                description='Produit du catalogue', price=Decimal('10.00'), image='', **fields)
+        for name in names
+    ])
+
+
+class BulkWriteSearchTests(TestCase):
+    """Les écritures en masse (sans post_save) gardent l'index de recherche à jour"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Cafés')
+
+    def test_bulk_created_products_are_searchable(self):
+        products = make_products(self.category, [f'Bulk blend {i}' for i in range(120)])
+        found = search.search_product_ids('bulk')
+        self.assertCountEqual(found, [product.pk for product in products])
+
+    def test_bulk_update_reindexes_description(self):
+        product, = make_products(self.category, ['Moka'])
+        product.description = 'Arômes de noisette'
+        Product.objects.bulk_update([product], ['description'])
+        self.assertEqual(search.search_product_ids('noisette'), [product.pk])
+
+    def test_filters_apply_to_all_matches(self):
+        make_products(self.category, [f'Bulk blend {i}' for i in range(search.MAX_RESULTS + 10)])
+        other = Category.objects.create(name='Moulins')
+        product = Product.objects.create(name='Moulin', category=other, product_type='accessoire',
+                                         description='Pour le café en bulk', price=Decimal('40.00'))
+        cards = search.search_products(ProductCard.objects.filter(category=other), 'bulk')
+        self.assertEqual([card.pk for card in cards], [product.pk])
+
+    def test_inverted_index_ranks_name_matches_first(self):
+        with mock.patch.object(search, 'uses_fts', return_value=False):
+            by_description, = make_products(self.category, ['Moka'])
+            by_description.description = 'Arabica du Yémen'
+            Product.objects.bulk_update([by_description], ['description'])
+            by_name, = make_products(self.category, ['Yemen Mokha'])
+            self.assertEqual(search.search_product_ids('yemen'), [by_name.pk, by_description.pk])
+
+    def test_update_refreshes_search_key_and_index(self):
+        product, = make_products(self.category, ['Café Éthiopie'])
+        self.assertEqual(Product.objects.get(pk=product.pk).search_key, 'cafe ethiopie')
+        Product.objects.filter(pk=product.pk).update(name='Thé vert Sencha')
+        self.assertEqual(Product.objects.get(pk=product.pk).search_key, 'the vert sencha')
+        self.assertEqual(search.search_product_ids('the vert'), [product.pk])
+        self.assertEqual(search.search_product_ids('cafe ethiopie'), [])
+
+    def test_category_rename_reindexes_products_in_bulk(self):
+        for fts in (True, False):
+            with self.subTest(fts=fts), mock.patch.object(search, 'uses_fts', return_value=fts):
+                queries = []
+                for size in (2, 30):
+                    category = Category.objects.create(name=f'Origine {fts} {size}')
+                    products = make_products(category, [f'Blend {fts} {size} {i}' for i in range(size)])
+                    category.name = f'Torréfaction {fts} {size}'
+                    with CaptureQueriesContext(connection) as captured:
+                        category.save()
+                    queries.append(len(captured))
+                    found = search.search_product_ids(f'torrefaction {fts} {size}')
+                    self.assertCountEqual(found, [product.pk for product in products])
+                # Pas une requête par produit
+                self.assertEqual(queries[0], queries[1])
+
+    def test_save_with_update_fields_refreshes_search_key(self):
+        product, = make_products(self.category, ['Café Éthiopie'])
+        product.name = 'Thé vert'
+        product.save(update_fields=['name'])
+        self.assertEqual(Product.objects.get(pk=product.pk).search_key, 'the vert')
+        self.assertEqual(search.search_product_ids('the vert'), [product.pk])
+        self.category.name = 'Thés'
+        self.category.save(update_fields=['name'])
+        self.assertEqual(Category.objects.get(pk=self.category.pk).search_key, 'thes')
+
+
+class CacheTagTests(TestCase):
+
+    def test_bump_waits_for_commit(self):
+        before = cache_tags.tag_versions(['catalog'])['catalog']
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_tags.bump('catalog')
+            # Un lecteur concurrent voit encore l'ancienne version
+            self.assertEqual(cache_tags.tag_versions(['catalog'])['catalog'], before)
+        self.assertNotEqual(cache_tags.tag_versions(['catalog'])['catalog'], before)
+
+
+class PricingTests(TestCase):
+    """Les colonnes de prix dénormalisées sont identiques quel que soit le chemin d'écriture"""
+
+    PRICES = [('3', '1'), ('8', '7.96'), ('8', '7.64'), ('19.99', '14.99'), ('10.50', '5.25'),
+              ('7', '7'), ('5', '6'), ('0', '2'), ('12', None)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Cafés')
+
+    def test_save_and_update_agree(self):
+        products = make_products(self.category, [f'Prix {i}' for i in range(len(self.PRICES))])
+        for product, (price, discount) in zip(products, self.PRICES):
+            with self.subTest(price=price, discount=discount):
+                discount = Decimal(discount) if discount else None
+                product.price, product.discount_price = Decimal(price), discount
+                product.save()
+                saved = Product.objects.values_list('effective_price', 'discount_percent').get(pk=product.pk)
+                Product.objects.filter(pk=product.pk).update(price=Decimal(price), discount_price=discount)
+                updated = Product.objects.values_list('effective_price', 'discount_percent').get(pk=product.pk)
+                self.assertEqual(saved, updated)
+        self.assertEqual(Product.objects.get(pk=products[0].pk).discount_percent, 67)
+        self.assertEqual(Product.objects.get(pk=products[1].pk).discount_percent, 1)
+
+    def test_backfill_refreshes_cards(self):
+        product, = make_products(self.category, ['Moka'])
+        # Prix modifié sans recalcul des colonnes dérivées (données antérieures)
+        QuerySet.update(Product.objects.filter(pk=product.pk), discount_price=Decimal('6.00'))
+        before = cache_tags.tag_versions([cache_tags.CATALOG])[cache_tags.CATALOG]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_effective_prices', stdout=StringIO())
+        card = ProductCard.objects.get(pk=product.pk)
+        self.assertEqual((card.effective_price, card.discount_percent), (Decimal('6.00'), 40))
+        self.assertEqual(card.prices.get(currency='EUR').effective_price, Decimal('6.00'))
+        self.assertNotEqual(cache_tags.tag_versions([cache_tags.CATALOG])[cache_tags.CATALOG], before)
+
+
+@skipIf(connection.vendor != 'sqlite', 'plans EXPLAIN QUERY PLAN de SQLite')
+class SortPlanTests(TestCase):
+    """Chaque mode de tri des listes est servi par un index, sans tri temporaire"""
+
+    # Listes servies par les index de ProductCard (une catégorie, plus
+    # restreinte, trie ses propres lignes)
+    FILTERS = [{}, {'product_type': 'cafe'}]
+
+    def _page_plan(self, key, filters):
+        mode = SORT_MODES[key]
+        # Comme les vues : les tris par prix passent par la projection des prix
+        listing = price_projection.in_currency(ProductCard.objects.filter(**filters), 'XOF',
+                                               indexed=sorts_by_price(key))
+        queryset, order_field = mode.apply(listing)
+        paginator = KeysetPaginator(queryset, order_field, tiebreak=mode.tiebreak)
+        return queryset.order_by(*paginator._ordering())[:paginator.page_size + 1].explain()
+
+    def test_sorts_are_index_backed(self):
+        for key in SORT_MODES:
+            for filters in self.FILTERS:
+                with self.subTest(sort=key, filters=filters):
+                    plan = self._page_plan(key, filters).upper()
+                    self.assertNotIn('TEMP B-TREE', plan, plan)
+                    full_scans = [line for line in plan.splitlines()
+                                  if 'SCAN' in line and 'CORE_PRODUCTCARD' in line and 'USING' not in line]
+                    self.assertEqual(full_scans, [], plan)
+
+
+class StockReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Accessoires')
+        cls.product = Product.objects.create(
+            name='Moulin', category=category, product_type='accessoire',
+            description='Moulin manuel', price=Decimal('30.00'), stock=20,
+        )
+
+    def test_order_only_invalidates_the_product(self):
+        before = cache_tags.tag_versions([cache_tags.CATALOG, cache_tags.product_tag(self.product.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(price_cart({self.product.pk: 2}).lines)
+        after = cache_tags.tag_versions(before)
+        self.assertEqual(after[cache_tags.CATALOG], before[cache_tags.CATALOG])
+        self.assertNotEqual(after[cache_tags.product_tag(self.product.pk)],
+                            before[cache_tags.product_tag(self.product.pk)])
+
+    def test_badge_change_invalidates_listings(self):
+        before = cache_tags.tag_versions([cache_tags.CATALOG])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(price_cart({self.product.pk: 17}).lines)
+        self.assertEqual(ProductCard.objects.get(pk=self.product.pk).stock_badge, 'low_stock')
+        self.assertNotEqual(cache_tags.tag_versions([cache_tags.CATALOG]), before)
+
+
+class ConcurrentStockReservationTests(TransactionTestCase):
+    """Commandes simultanées sur un même produit : le stock n'est jamais survendu"""
+
+    STOCK = 15
+    ORDERS = 40
+    THREADS = 8
+
+    def setUp(self):
+        category = Category.objects.create(name='Accessoires')
+        self.product = Product.objects.create(
+            name='Moulin', category=category, product_type='accessoire',
+            description='Moulin manuel', price=Decimal('30.00'), stock=self.STOCK,
+        )
+        self.user = User.objects.create(username='client')
+
+    def place(self):
+        while True:
+            try:
+                place_order(self.user, price_cart({self.product.pk: 1}), 'Adresse')
+                return 'placed'
+            except InsufficientStock:
+                return 'rejected'
+            except OperationalError:
+                # SQLite : base verrouillée par un autre écrivain, on réessaie
+                time.sleep(0.01)
+
+    def test_no_overselling(self):
+        results = []
+        remaining = [self.ORDERS]
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    outcome = self.place()
+                    with lock:
+                        results.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        ordered = sum(item.quantity for order in self.user.orders.all() for item in order.items.all())
+        self.assertEqual(results.count('placed'), self.STOCK)
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(ordered, self.STOCK)
+
+
+class IdempotencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Cafés')
+        cls.product = Product.objects.create(
+            name='Moka', category=category, product_type='cafe',
+            description='Café moka', price=Decimal('12.00'), stock=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def add_to_cart(self, client, key):
+        return client.post(reverse('add_to_cart_ajax'), json.dumps({'product_id': self.product.pk}),
+                           content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_anonymous_retry_without_cookies_is_replayed(self):
+        first = self.add_to_cart(Client(), 'a1b2c3')
+        # Première réponse perdue : la nouvelle tentative n'a aucun cookie
+        retry = self.add_to_cart(Client(), 'a1b2c3')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.content, first.content)
+        self.assertFalse(Session.objects.exists())
+
+    def test_abandoned_reservation_expires_after_lease(self):
+        IdempotencyKey.objects.create(scope='add_to_cart', owner='anonymous', key='crashed',
+                                      request_hash='x', expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.add_to_cart(Client(), 'crashed')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(IdempotencyKey.objects.get(key='crashed').status_code)
+
+    def test_replay_sets_the_cart_cookie(self):
+        first = self.add_to_cart(Client(), 'lost-response')
+        retry = self.add_to_cart(Client(), 'lost-response')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.cookies['cart'].value, first.cookies['cart'].value)
+        # Rejoué depuis la table (cache vidé)
+        cache.clear()
+        replayed = self.add_to_cart(Client(), 'lost-response')
+        self.assertEqual(replayed.cookies['cart'].value, first.cookies['cart'].value)
+        client = Client()
+        client.cookies['cart'] = replayed.cookies['cart'].value
+        self.assertEqual(load_cart(client.get('/').wsgi_request), {str(self.product.pk): 1})
+
+
+class CartStorageTests(TestCase):
+
+    def test_session_cart_is_taken_over_once(self):
+        client = Client()
+        session = client.session
+        session['cart'] = {'7': 2}
+        session.save()
+        request = RequestFactory().get('/')
+        request.session = client.session
+        request.COOKIES = {}
+        self.assertEqual(load_cart(request), {'7': 2})
+        self.assertNotIn('cart', request.session)
+        response = HttpResponse()
+        finalize_cart(request, response)
+        self.assertIn('cart', response.cookies)
+
+
+    def _request(self, client):
+        request = RequestFactory().get('/')
+        request.session = client.session
+        request.COOKIES = dict((name, morsel.value) for name, morsel in client.cookies.items())
+        return request
+
+    def _respond(self, client, request):
+        response = HttpResponse()
+        finalize_cart(request, response)
+        request.session.save()
+        client.cookies.update(response.cookies)
+        return response
+
+    @override_settings(CART_STORAGE='signed_cookie')
+    def test_cart_too_large_for_a_cookie_stays_in_session(self):
+        client = Client()
+        client.session.save()
+        large = {str(pk): 2 for pk in range(1, 600)}
+        request = self._request(client)
+        save_cart(request, large)
+        response = self._respond(client, request)
+        # Le cookie serait ignoré par le navigateur : il est supprimé
+        self.assertEqual(response.cookies['cart'].value, '')
+        self.assertEqual(load_cart(self._request(client)), large)
+
+        request = self._request(client)
+        save_cart(request, {'7': 1})
+        response = self._respond(client, request)
+        self.assertLessEqual(len(response.cookies['cart'].OutputString()), 4096)
+        request = self._request(client)
+        self.assertNotIn('cart', request.session)
+        self.assertEqual(load_cart(request), {'7': 1})
+
+
+class JobQueueTests(TestCase):
+
+    def test_periodic_jobs_are_scheduled_once_per_interval(self):
+        self.assertEqual(jobs.schedule_periodic(), 2)
+        Job.objects.update(status='done', finished_at=timezone.now())
+        # Déjà exécutées dans l'intervalle : rien de nouveau
+        self.assertEqual(jobs.schedule_periodic(), 0)
+        Job.objects.filter(name='purge_idempotency_keys').update(
+            created_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.schedule_periodic(), 1)
+
+
+    def test_heartbeat_keeps_long_jobs_from_being_requeued(self):
+        old = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        alive, dead = [
+            Job.objects.create(name='purge_idempotency_keys', status='running',
+                               locked_by=worker, locked_at=old, run_at=old)
+            for worker in ('worker-a', 'worker-b')
+        ]
+        jobs.heartbeat('worker-a', [alive.pk, dead.pk])
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, 'running')
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, 'queued')
+
+
+class OrderNumberTests(TransactionTestCase):
+    """Plusieurs allocateurs (un par processus en production) ne se chevauchent jamais"""
+
+    ALLOCATORS = 4
+    COUNT = 200
+
+    def test_concurrent_allocators_never_duplicate(self):
+        OrderSequence.objects.get_or_create(name=SEQUENCE_NAME, defaults={'next_value': 1})
+        start = OrderSequence.objects.get(name=SEQUENCE_NAME).next_value
+        batches = [[] for _ in range(self.ALLOCATORS)]
+
+        def worker(numbers):
+            allocator = BlockAllocator(SEQUENCE_NAME, block_size=10)
+            try:
+                while len(numbers) < self.COUNT:
+                    try:
+                        numbers.append(allocator.allocate())
+                    except OperationalError:
+                        # SQLite : base verrouillée par un autre écrivain, on réessaie
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(batch,)) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(len(numbers), self.ALLOCATORS * self.COUNT)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertGreaterEqual(min(numbers), start)
+
+
+def _contend(barrier, results, key):
+    # Processus fils : tente de prendre le verrou en même temps que les autres
+    barrier.wait()
+    with single_flight.single_flight(key) as leader:
+        results.put(leader)
+        if leader:
+            time.sleep(0.5)
+
+
+@skipIf(single_flight.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+        'fcntl et fork requis')
+class SingleFlightProcessTests(SimpleTestCase):
+    """Avec un cache local au processus, le verrou de fichier est partagé entre processus"""
+
+    PROCESSES = 6
+
+    def test_one_leader_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(self.PROCESSES)
+        results = context.Queue()
+        key = f'test-{time.time_ns()}'
+        processes = [context.Process(target=_contend, args=(barrier, results, key))
+                     for _ in range(self.PROCESSES)]
+        for process in processes:
+            process.start()
+        leaders = [results.get(timeout=10) for _ in processes]
+        for process in processes:
+            process.join()
+        self.assertEqual(leaders.count(True), 1)
+
+
+class CountingHandler(StubHandler):
+    """API de taux qui compte les appels et répond lentement : tous les appelants se chevauchent"""
+    calls = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with CountingHandler.lock:
+            CountingHandler.calls += 1
+        time.sleep(0.3)
+        super().do_GET()
+
+
+class RateRefreshSingleFlightTests(TransactionTestCase):
+
+    CALLERS = 100
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        CountingHandler.calls = 0
+
+    def test_concurrent_refreshes_call_the_api_once(self):
+        currency_settings = {
+            **settings.CURRENCY_SETTINGS,
+            'EXCHANGE_RATE_API_URL': f'http://127.0.0.1:{self.server.server_port}/v4/latest/',
+        }
+        barrier = threading.Barrier(self.CALLERS)
+        results = []
+
+        def refresh():
+            try:
+                barrier.wait()
+                results.append(exchange_rates.refresh_rates())
+            finally:
+                connection.close()
+
+        with override_settings(CURRENCY_SETTINGS=currency_settings):
+            threads = [threading.Thread(target=refresh) for _ in range(self.CALLERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(CountingHandler.calls, 1)
+        self.assertEqual(sum(1 for matrix in results if matrix is not None), 1)
+
+
+class FakeProviderHandler(StubHandler):
+    """API de taux avec keep-alive, qui note les connexions et peut échouer ou répondre n'importe quoi"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    status = 200
+    payload = None
+    connections = set()
+
+    def do_GET(self):
+        FakeProviderHandler.connections.add(self.client_address)
+        if self.status != 200 or self.payload is not None:
+            body = json.dumps(self.payload).encode() if self.payload is not None else b''
+            self.send_response(self.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+
+class RateProviderClientTests(SimpleTestCase):
+    """Client de l'API de taux : connexions réutilisées et disjoncteur"""
+
+    CODES = ['EUR', 'USD', 'XOF']
+    RESET = 0.2
+
+    def setUp(self):
+        FakeProviderHandler.status, FakeProviderHandler.payload = 200, None
+        self.enterContext(mock.patch.object(rate_provider, 'logger'))
+        FakeProviderHandler.connections = set()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeProviderHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = RateProviderClient(f'http://127.0.0.1:{server.server_port}/v4/latest/',
+                                         failure_threshold=3, reset_timeout=self.RESET)
+        self.addCleanup(self.client.close)
+
+    def _open_breaker(self):
+        for _ in range(self.client.breaker.failure_threshold):
+            with self.assertRaises(ValueError):
+                self.client.fetch('EUR', self.CODES)
+        self.assertEqual(self.client.breaker.state, rate_provider.OPEN)
+
+    def test_connections_are_reused(self):
+        for _ in range(20):
+            rates = self.client.fetch('EUR', self.CODES)
+        self.assertEqual(set(rates), set(self.CODES))
+        self.assertEqual(len(FakeProviderHandler.connections), 1)
+
+    def test_breaker_opens_then_recovers(self):
+        FakeProviderHandler.status = 503
+        for _ in range(self.client.breaker.failure_threshold):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                self.client.fetch('EUR', self.CODES)
+        self.assertEqual(self.client.breaker.state, rate_provider.OPEN)
+        with self.assertRaises(rate_provider.ProviderUnavailable):
+            self.client.fetch('EUR', self.CODES)
+
+        FakeProviderHandler.status = 200
+        time.sleep(self.RESET)
+        self.assertEqual(self.client.breaker.state, rate_provider.HALF_OPEN)
+        self.client.fetch('EUR', self.CODES)
+        self.assertEqual(self.client.breaker.state, rate_provider.CLOSED)
+
+    def test_malformed_payloads_count_as_failures(self):
+        for payload in [{'rates': ['EUR']}, {'rates': {'USD': 'abc'}}, {'rates': {'USD': 'NaN'}}, ['rates']]:
+            with self.subTest(payload=payload):
+                FakeProviderHandler.payload = payload
+                self._open_breaker()
+                # L'appel d'essai en demi-ouvert échoue aussi : le disjoncteur se rouvre
+                time.sleep(self.RESET)
+                with self.assertRaises(ValueError):
+                    self.client.fetch('EUR', self.CODES)
+                self.assertEqual(self.client.breaker.state, rate_provider.OPEN)
+                # ... et un nouvel essai est permis, qui referme le disjoncteur
+                FakeProviderHandler.payload = None
+                time.sleep(self.RESET)
+                self.client.fetch('EUR', self.CODES)
+                self.assertEqual(self.client.breaker.state, rate_provider.CLOSED)
+
+
+class ConvertPricesApiTests(TestCase):
+
+    def get(self, **params):
+        return self.client.get(reverse('api_convert_prices'), params)
+
+    def test_rejects_non_finite_and_huge_amounts(self):
+        for amount in ['inf', '-Infinity', 'nan', 'sNaN', '1e999999', '1e13']:
+            with self.subTest(amount=amount):
+                response = self.get(to='USD', amounts=amount)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('NaN', response.json()['error'])
+
+    def test_converts_amounts(self):
+        response = self.get(to='EUR', amounts='12.5,40')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['amount'] for item in response.json()['data']['amounts']], ['12.50', '40.00'])
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_cookie_currency_varies_on_cookie(self):
+        self.client.cookies['currency'] = 'USD'
+        response = self.get(amounts='10')
+        self.assertEqual(response.json()['data']['code'], 'USD')
+        self.assertIn('Cookie', response['Vary'])
+        revalidated = self.client.get(reverse('api_convert_prices'), {'amounts': '10'},
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn('Cookie', revalidated['Vary'])
+        # Même URL, autre devise : l'ETag ne correspond plus
+        self.client.cookies['currency'] = 'XOF'
+        other = self.client.get(reverse('api_convert_prices'), {'amounts': '10'},
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+
+class CurrencyPagesTests(TestCase):
+    """L'accueil et la fiche produit affichent les prix dans la devise du visiteur"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Cafés')
+        cls.product, cls.related = [
+            Product.objects.create(name=name, category=category, product_type='cafe',
+                                   description='Café', price=Decimal('20.00'),
+                                   discount_price=Decimal('15.00'), stock=5, is_featured=True)
+            for name in ('Moka', 'Java')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies['currency'] = 'USD'
+
+    def test_home_prices_in_request_currency(self):
+        content = self.client.get(reverse('home')).content.decode()
+        self.assertIn('<span class="sale">$', content)
+        self.assertNotIn('15.00€', content)
+
+    def test_product_detail_prices_in_request_currency(self):
+        content = self.client.get(reverse('product_detail', args=[self.product.pk])).content.decode()
+        self.assertIn('<span class="sale-price">$', content)
+        self.assertIn('<p class="related-price">$', content)
+
+
+class PageCacheCsrfTests(TestCase):
+    """Une page en cache ne transmet jamais le jeton CSRF d'un autre visiteur"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Cafés')
+        cls.product = Product.objects.create(name='Moka', category=category, product_type='cafe',
+                                             description='Café', price=Decimal('20.00'), stock=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_product_detail_is_cached_without_token(self):
+        url = reverse('product_detail', args=[self.product.pk])
+        first = Client(enforce_csrf_checks=True).get(url)
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, first.cookies)
+        second = Client(enforce_csrf_checks=True).get(url)
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertContains(second, 'name="csrfmiddlewaretoken" value=""')
+
+    def test_page_using_the_token_is_not_cached(self):
+        factory = RequestFactory()
+
+        @page_cache.cache_anonymous_page()
+        def view(request):
+            return HttpResponse(get_token(request))
+
+        for _ in range(2):
+            request = factory.get('/tokens/')
+            request.user = AnonymousUser()
+            response = view(request)
+            self.assertFalse(response.has_header('X-Page-Cache'))
+
+
+class PriceFormatTests(SimpleTestCase):
+
+    def test_currency_conventions(self):
+        self.assertEqual(format_price(Decimal('12500.5'), 'XOF'), '12\u202f501\xa0FCFA')
+        self.assertEqual(format_price(Decimal('1234567.891'), 'EUR'), '1\u202f234\u202f567,89\xa0€')
+        self.assertEqual(format_price(Decimal('-1234.5'), 'USD'), '-$1,234.50')
+        self.assertEqual(format_price(None, 'EUR'), '')
+
+    def test_invalid_amounts_degrade(self):
+        for amount in [Decimal('NaN'), Decimal('sNaN'), Decimal('Infinity'), float('nan'), 'abc']:
+            with self.subTest(amount=amount):
+                self.assertEqual(format_price(amount, 'EUR'), str(amount))
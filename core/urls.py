@@ -4,7 +4,7 @@ from . import views
 from .views import (
     api_convert_price, api_exchange_rates, home, login_view, signup_view, account_view, products_view, 
     product_detail_view, product_type_view, cart_view, checkout_view, add_to_cart_ajax, 
-    process_payment, payment_success_view, update_currency_preference
+    process_payment, payment_success_view, update_currency_preference, session_fragment
 )
 from .dashboard_views import dashboard, dashboard_analytics
 
@@ -21,13 +21,16 @@ urlpatterns = [
     path('checkout/', checkout_view, name='checkout'),
     path('checkout/success/', payment_success_view, name='payment_success'),
     path('api/add-to-cart/', add_to_cart_ajax, name='add_to_cart_ajax'),
+    path('api/cart/batch/', views.cart_batch, name='cart_batch'),
     path('api/process-payment/', process_payment, name='process_payment'),
+    path('api/session-fragment/', session_fragment, name='session_fragment'),
     path('admin-dashboard/', dashboard, name='dashboard'),
     path('admin-dashboard/analytics/', dashboard_analytics, name='dashboard_analytics'),
     # URLs pour la gestion des devises
     path('currency/update/',update_currency_preference, name='update_currency'),
     path('api/exchange-rates/',api_exchange_rates, name='api_exchange_rates'),
     path('api/convert-price/',api_convert_price, name='api_convert_price'),
+    path('api/convert-prices/', views.api_convert_prices, name='api_convert_prices'),
     path('product/<int:product_id>/review/', views.add_review, name='add_review'),
 ]
 
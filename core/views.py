@@ -4,36 +4,158 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import quote_etag, url_has_allowed_host_and_scheme
 from allauth.socialaccount.models import SocialApp
 from django.db.models import Sum, Q
-from .models import Category, Product, Order, Review
+from .models import Category, Product, ProductCard, Order, Review
 from decimal import Decimal
 import json
 from .models import Currency, UserCurrencyPreference
-from .currency_service import CurrencyConverter, get_user_currency
+from .currency_service import CurrencyConverter
+from .request_currency import get_request_currency, remember_currency
 from .models import Currency, UserCurrencyPreference
 from .forms import ReviewForm
+from . import cache_tags, exchange_rates, jobs, price_projection
+from .page_cache import cache_anonymous_page
+from .conditional import catalog_condition, product_condition, product_tags, rates_condition, rates_etag
+from .pagination import KeysetPaginator, InvalidCursor
+from .search import search_products
+from .normalization import prefix_range, search_key
+from .facets import filter_signature, get_facets, price_bucket_range
+from .sorting import resolve_sort, sort_choices, sorts_by_price
+from .cart_storage import load_cart, save_cart
+from .cart import DEFAULT_SHIPPING, CartError, get_priced_cart, mutate_cart
+from .orders import EmptyCart, InsufficientStock, place_order
+from .idempotency import idempotent
 
 
+PRODUCTS_PER_PAGE = 24
 
 
+def _paginate_products(request, products):
+    """Keyset-paginate a product queryset using the ?sort and ?cursor params"""
+    # Unknown sorts fall back to the default mode (relevance when searching)
+    sort_mode = resolve_sort(request.GET.get('sort', ''), products)
+    products, order_field = sort_mode.apply(products)
+    paginator = KeysetPaginator(products, order_field, page_size=PRODUCTS_PER_PAGE,
+                                sort_key=sort_mode.key, tiebreak=sort_mode.tiebreak)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def _product_to_dict(card, currency=None):
+    """Compact representation of a product card for the JSON listings"""
+    data = {
+        'id': card.product_id,
+        'name': card.name,
+        'slug': card.slug,
+        'category': card.category_name,
+        'product_type': card.product_type,
+        'price': str(card.price),
+        'effective_price': str(card.effective_price),
+        'discount_percentage': card.discount_percent,
+        'image_url': card.thumbnail_url,
+        'rating': card.rating,
+        'stock_badge': card.stock_badge,
+    }
+    if currency:
+        # Prices in the shopper's currency, from the price projection
+        data.update(currency=currency, display_price=f'{card.display_price:.2f}',
+                    display_original_price=f'{card.display_original_price:.2f}')
+    return data
+
+
+def _apply_price_and_stock_filters(request, products, currency):
+    """Price range (explicit bounds or facet bucket, in the listing currency) and stock filters"""
+    min_price = request.GET.get('min_price')
+    max_price = request.GET.get('max_price')
+    bucket = price_bucket_range(request.GET.get('price_range', ''), currency)
+    if bucket:
+        min_price, max_price = bucket
+        products = products.filter(display_price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(display_price__lt=max_price)
+    else:
+        if min_price:
+            products = products.filter(display_price__gte=min_price)
+        if max_price:
+            products = products.filter(display_price__lte=max_price)
+    
+    if request.GET.get('in_stock'):
+        products = products.filter(in_stock=True)
+    return products
+
+
+def _needs_price_index(request):
+    """Price sorts and price filters join the price projection to use its index"""
+    return sorts_by_price(request.GET.get('sort', '')) or any(
+        request.GET.get(param) for param in ('min_price', 'max_price', 'price_range')
+    )
+
 
+def _wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def _page_json(page, facets=None, currency=None):
+    data = {
+        'success': True,
+        'results': [_product_to_dict(product, currency) for product in page],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+        'sort': page.sort,
+    }
+    if facets is not None:
+        data['facets'] = facets
+    return JsonResponse(data)
+
+
+
+
+
+@catalog_condition
+@cache_anonymous_page()
 def home(request):
     """Home page with featured products"""
-    featured_products = Product.objects.filter(is_featured=True)[:4]
-    categories = Category.objects.filter(is_active=True)
+    currency = price_projection.listing_currency(request.currency.code)
+    featured_products = cache_tags.get_or_set(
+        f'home_featured_products_{currency}', [cache_tags.CATALOG],
+        lambda: list(price_projection.in_currency(ProductCard.objects.filter(is_featured=True), currency)[:4])
+    )
+    categories = cache_tags.get_or_set(
+        'active_categories', [cache_tags.CATALOG],
+        lambda: list(Category.objects.filter(is_active=True))
+    )
     context = {
         'featured_products': featured_products,
-        'categories': categories
+        'categories': categories,
+        'currency': currency,
     }
     return render(request, 'home.html', context)
 
+@catalog_condition
+@cache_anonymous_page()
 def products_view(request):
     """Products listing page with filters"""
-    products = Product.objects.filter(is_active=True)
+    currency = price_projection.listing_currency(request.currency.code)
+    products = price_projection.in_currency(ProductCard.objects.all(), currency,
+                                            indexed=_needs_price_index(request))
     categories = Category.objects.filter(is_active=True)
     
+    # Search
+    query = request.GET.get('q')
+    if query:
+        products = search_products(products, query)
+    
+    # Facet counts for the current query, before drill-down filters
+    facets = get_facets(products, filter_signature(view='products', q=query, currency=currency), currency)
+    
     # Filter by category
     category_param = request.GET.get('category')
     selected_category = None
@@ -43,47 +165,49 @@ def products_view(request):
             selected_category = Category.objects.get(id=int(category_param))
             products = products.filter(category=selected_category)
         except (ValueError, Category.DoesNotExist):
-            # If not ID, try by name
-            selected_category = Category.objects.filter(name__iexact=category_param).first()
+            # If not ID, try by normalized name, then by name prefix (both indexed)
+            key = search_key(category_param)
+            selected_category = (
+                Category.objects.filter(search_key=key).first() or
+                Category.objects.filter(**prefix_range('search_key', key)).order_by('search_key').first()
+                if key else None
+            )
             if selected_category:
                 products = products.filter(category=selected_category)
     
-    # Filter by price range
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
+    # Filter by product type
+    type_param = request.GET.get('type')
+    if type_param in dict(Product.PRODUCT_TYPES):
+        products = products.filter(product_type=type_param)
     
-    # Search
-    query = request.GET.get('q')
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query)
-        )
+    products = _apply_price_and_stock_filters(request, products, currency)
     
-    # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    products = products.order_by(sort_by)
+    # Sorting + keyset pagination
+    page = _paginate_products(request, products)
+    if _wants_json(request):
+        return _page_json(page, facets, currency)
     
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
+        'facets': facets,
+        'sort_choices': sort_choices(searching=bool(query)),
+        'currency': currency,
         'categories': categories,
         'selected_category': selected_category,
         'query': query
     }
     return render(request, 'products.html', context)
 
+@catalog_condition
+@cache_anonymous_page()
 def product_type_view(request, product_type):
     """View products by type (cafe, pain, machine, accessoire)"""
     product_type_display = dict(Product.PRODUCT_TYPES).get(product_type, '')
     
-    products = Product.objects.filter(
-        product_type=product_type,
-        is_active=True
-    )
+    currency = price_projection.listing_currency(request.currency.code)
+    products = price_projection.in_currency(ProductCard.objects.filter(product_type=product_type), currency,
+                                            indexed=_needs_price_index(request))
     
     # Get all categories for this product type
     sub_categories = Category.objects.filter(
@@ -94,25 +218,26 @@ def product_type_view(request, product_type):
     # Search within type
     query = request.GET.get('q')
     if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query)
-        )
+        products = search_products(products, query)
     
-    # Filter by price range
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
+    facets = get_facets(products, filter_signature(view='product_type', type=product_type, q=query,
+                                                   currency=currency), currency)
     
-    # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    products = products.order_by(sort_by)
+    products = _apply_price_and_stock_filters(request, products, currency)
+    
+    # Sorting + keyset pagination
+    product_count = products.count()
+    page = _paginate_products(request, products)
+    if _wants_json(request):
+        return _page_json(page, facets, currency)
     
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
+        'facets': facets,
+        'sort_choices': sort_choices(searching=bool(query)),
+        'currency': currency,
+        'product_count': product_count,
         'product_type': product_type,
         'product_type_display': product_type_display,
         'sub_categories': sub_categories,
@@ -120,48 +245,66 @@ def product_type_view(request, product_type):
     }
     return render(request, 'product_type.html', context)
 
+@product_condition
+@cache_anonymous_page(tags=lambda request, product_id: product_tags(product_id))
 def product_detail_view(request, product_id):
     """Product detail page"""
     product = get_object_or_404(Product, id=product_id, is_active=True)
-    reviews = product.reviews.all()
-    related_products = Product.objects.filter(
-        category=product.category, 
-        is_active=True
-    ).exclude(id=product_id)[:4]
+    reviews = cache_tags.get_or_set(
+        f'product_reviews_{product.pk}', [cache_tags.reviews_tag(product.pk)],
+        lambda: list(product.reviews.select_related('user'))
+    )
+    currency = price_projection.listing_currency(request.currency.code)
+    related_products = cache_tags.get_or_set(
+        f'related_products_{product.pk}_{currency}', [cache_tags.CATALOG],
+        lambda: list(price_projection.in_currency(ProductCard.objects.filter(
+            category_id=product.category_id
+        ).exclude(pk=product_id), currency)[:4])
+    )
+    # Prix du produit dans la même devise que les listes (projection ProductPrice)
+    prices = price_projection.in_currency(ProductCard.objects.filter(pk=product.pk), currency).values(
+        'display_price', 'display_original_price').first()
     
     context = {
         'product': product,
+        'prices': prices,
+        'currency': currency,
         'reviews': reviews,
         'related_products': related_products,
         'average_rating': product.rating if product.rating else 0
     }
     return render(request, 'product_detail.html', context)
 
+@never_cache
+@require_GET
+def session_fragment(request):
+    """
+    Per-visitor fragments of the cached catalog pages (login state, cart
+    count, currency, CSRF token), filled in by static/js/session.js
+    """
+    cart = load_cart(request)
+    data = {
+        'authenticated': request.user.is_authenticated,
+        'username': request.user.username if request.user.is_authenticated else None,
+        'cart_count': sum(cart.values()),
+        'currency': request.currency.code,
+        # Cached pages embed another visitor's token: hand out this visitor's one
+        'csrf_token': get_token(request),
+    }
+    return JsonResponse(data)
+
 def cart_view(request):
     """Shopping cart page"""
-    cart_items = request.session.get('cart', {})
-    total_price = Decimal('0')
-    items = []
-    
-    for product_id, quantity in cart_items.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            total_price += product.price * quantity
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': product.price * quantity
-            })
-        except Product.DoesNotExist:
-            pass
+    cart = get_priced_cart(request)
     
     context = {
-        'cart_items': items,
-        'total_price': total_price,
-        'cart_count': len(cart_items)
+        'cart_items': cart.lines,
+        'total_price': cart.subtotal,
+        'cart_count': len(load_cart(request))
     }
     return render(request, 'cart.html', context)
 
+@idempotent('add_to_cart')
 def add_to_cart_ajax(request):
     """AJAX endpoint to add product to cart"""
     if request.method == 'POST':
@@ -173,8 +316,8 @@ def add_to_cart_ajax(request):
         try:
             product = Product.objects.get(id=product_id, is_active=True)
             
-            # Get or create cart in session
-            cart = request.session.get('cart', {})
+            # Get the cart from the configured cart storage
+            cart = load_cart(request)
             product_id_str = str(product_id)
             
             # Add or update quantity
@@ -183,8 +326,7 @@ def add_to_cart_ajax(request):
             else:
                 cart[product_id_str] = quantity
             
-            request.session['cart'] = cart
-            request.session.modified = True
+            save_cart(request, cart)
             
             return JsonResponse({
                 'success': True,
@@ -200,121 +342,120 @@ def add_to_cart_ajax(request):
     
     return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
 
+def _cart_json(cart):
+    """Cart lines and totals, as returned by the cart APIs"""
+    return {
+        'lines': [
+            {
+                'product_id': line.product.pk,
+                'name': line.product.name,
+                'quantity': line.quantity,
+                'unit_price': str(line.unit_price),
+                'total': str(line.total),
+            }
+            for line in cart
+        ],
+        'cart_count': cart.item_count,
+        'subtotal': str(cart.subtotal),
+        'shipping_cost': str(cart.shipping_cost),
+        'tax': str(cart.tax),
+        'total': str(cart.total),
+    }
+
+@require_POST
+@idempotent('cart_batch')
+def cart_batch(request):
+    """
+    Apply a batch of cart operations in one request:
+    {"operations": [{"op": "add"|"set"|"remove", "product_id": 1, "quantity": 2}, ...]}
+    The whole batch is rejected if any operation is invalid.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
+    
+    try:
+        cart = mutate_cart(request, data.get('operations'),
+                           data.get('shipping_method', DEFAULT_SHIPPING))
+    except CartError as e:
+        return JsonResponse({'success': False, 'message': str(e), 'errors': e.errors}, status=400)
+    
+    return JsonResponse({'success': True, **_cart_json(cart)})
+
 def checkout_view(request):
     """Checkout page - Redirect to payment"""
-    cart_items = request.session.get('cart', {})
+    cart_items = load_cart(request)
     
     # Redirect to cart if empty
     if not cart_items:
         return redirect('cart')
     
-    # Calculate cart totals
-    total_price = 0
-    items = []
-    
-    for product_id, quantity in cart_items.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            item_total = product.price * quantity
-            total_price += item_total
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-        except Product.DoesNotExist:
-            pass
-    
-    # Determine shipping cost
-    shipping_method = request.POST.get('shipping', 'standard')
-    shipping_costs = {
-        'standard': Decimal('0'),
-        'express': Decimal('9.99'),
-        'overnight': Decimal('19.99')
-    }
-    shipping_cost = shipping_costs.get(shipping_method, Decimal('0'))
-    
-    # Calculate tax (20%)
-    tax = (total_price * Decimal('0.20')).quantize(Decimal('0.01'))
-    final_total = (total_price + shipping_cost + tax).quantize(Decimal('0.01'))
+    # Price the whole cart in one query (shipping method defaults to standard)
+    cart = get_priced_cart(request, request.POST.get('shipping', DEFAULT_SHIPPING))
     
     context = {
-        'cart_items': items,
-        'cart_total': total_price,
-        'shipping_cost': shipping_cost,
-        'tax': tax,
-        'final_total': final_total,
-        'total': final_total,
+        'cart_items': cart.lines,
+        'cart_total': cart.subtotal,
+        'shipping_cost': cart.shipping_cost,
+        'tax': cart.tax,
+        'final_total': cart.total,
+        'total': cart.total,
     }
     return render(request, 'payment.html', context)
 
+@idempotent('process_payment')
 def process_payment(request):
     """AJAX endpoint to process payment"""
     if request.method == 'POST':
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'message': 'Connexion requise'}, status=401)
         try:
             data = json.loads(request.body)
-            cart_items = request.session.get('cart', {})
+            cart_items = load_cart(request)
             
             if not cart_items:
                 return JsonResponse({'success': False, 'message': 'Panier vide'}, status=400)
             
-            # Calculate totals
-            total_price = Decimal('0')
-            for product_id, quantity in cart_items.items():
-                try:
-                    product = Product.objects.get(id=product_id)
-                    total_price += product.price * quantity
-                except Product.DoesNotExist:
-                    pass
-            
-            shipping_method = data.get('shipping_method', 'standard')
-            shipping_costs = {
-                'standard': Decimal('0'),
-                'express': Decimal('9.99'),
-                'overnight': Decimal('19.99')
-            }
-            shipping_cost = shipping_costs.get(shipping_method, Decimal('0'))
-            
-            tax = (total_price * Decimal('0.20')).quantize(Decimal('0.01'))
-            final_total = (total_price + shipping_cost + tax).quantize(Decimal('0.01'))
+            cart = get_priced_cart(request, data.get('shipping_method', DEFAULT_SHIPPING))
             
             # Get address info
-            first_name = data.get('first_name', 'Guest')
-            last_name = data.get('last_name', '')
-            email = data.get('email', '')
-            phone = data.get('phone', '')
-            address = data.get('address', '')
-            city = data.get('city', '')
-            postal_code = data.get('postal_code', '')
+            full_name = f"{data.get('first_name', 'Guest')} {data.get('last_name', '')}".strip()
+            shipping_address = '\n'.join(part for part in [
+                full_name,
+                data.get('address', ''),
+                f"{data.get('postal_code', '')} {data.get('city', '')}".strip(),
+                data.get('country', ''),
+                data.get('phone', ''),
+                data.get('email', ''),
+            ] if part)
             
-            # Create order
-            if request.user.is_authenticated:
-                order = Order.objects.create(
-                    user=request.user,
-                    total_amount=final_total,
-                    shipping_method=shipping_method,
-                    status='pending'
-                )
-                
-                # Add items to order
-                for product_id, quantity in cart_items.items():
-                    try:
-                        product = Product.objects.get(id=product_id)
-                        # Assuming OrderItem model exists
-                        # OrderItem.objects.create(order=order, product=product, quantity=quantity)
-                    except Product.DoesNotExist:
-                        pass
+            # Reserve stock, create the order and its items in one transaction
+            order = place_order(request.user, cart, shipping_address,
+                                payment_method=data.get('payment_method', 'card'))
+            jobs.enqueue('send_order_confirmation', {'order_id': order.pk})
             
             # Clear cart
-            request.session['cart'] = {}
-            request.session.modified = True
+            save_cart(request, {})
             
             return JsonResponse({
                 'success': True,
                 'message': 'Commande créée avec succès',
-                'order_id': order.id if request.user.is_authenticated else None,
-                'total': final_total
+                'order_id': order.id,
+                'order_number': order.order_number,
+                'total': cart.total
             })
+        except InsufficientStock as e:
+            names = ', '.join(shortfall['name'] for shortfall in e.shortfalls)
+            return JsonResponse({
+                'success': False,
+                'message': f'Stock insuffisant : {names}',
+                'shortfalls': e.shortfalls
+            }, status=409)
+        except EmptyCart:
+            return JsonResponse({'success': False, 'message': 'Panier vide'}, status=400)
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
     
@@ -425,9 +566,11 @@ def signup_view(request):
     }
     return render(request, 'signup.html', context)
 
-@login_required
 def update_currency_preference(request):
-    """Met à jour la préférence de devise de l'utilisateur"""
+    """Met à jour la préférence de devise (profil si connecté, cookie sinon)"""
+    if not request.user.is_authenticated:
+        return _update_visitor_currency(request)
+
     if request.method == 'POST':
         currency_code = request.POST.get('currency')
         
@@ -462,6 +605,19 @@ def update_currency_preference(request):
     return redirect('account')
 
 
+def _update_visitor_currency(request):
+    """Visiteur anonyme : devise retenue dans un cookie, retour à la page d'origine"""
+    next_url = request.POST.get('next') or request.META.get('HTTP_REFERER')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        next_url = 'home'
+    response = redirect(next_url)
+    currency_code = request.POST.get('currency')
+    if request.method == 'POST' and currency_code in CurrencyConverter.SUPPORTED_CURRENCIES:
+        remember_currency(request, response, currency_code)
+    return response
+
+
 def api_exchange_rates(request):
     """API pour récupérer les taux de change en temps réel"""
     base_currency = request.GET.get('base', 'XOF')
@@ -504,10 +660,86 @@ def api_convert_price(request):
         }, status=400)
 
 
+MAX_BATCH_CONVERSIONS = 500
+
+
+# Au-delà, une conversion dépasserait la précision des montants affichés
+MAX_CONVERTIBLE_AMOUNT = Decimal('1000000000000')
+
+
+def _parse_list(value, parse):
+    return [parse(item) for item in value.split(',') if item.strip()] if value else []
+
+
+def _parse_amount(value):
+    """Montant fini et raisonnable ; Decimal accepte aussi inf, nan et 1e999999"""
+    amount = Decimal(value)
+    if not amount.is_finite() or abs(amount) > MAX_CONVERTIBLE_AMOUNT:
+        raise ValueError(value)
+    return amount
+
+
+@require_GET
+@rates_condition
+def api_convert_prices(request):
+    """
+    Batch conversion against a single rate snapshot.
+
+    GET ?to=USD&amounts=12.5,40&from=EUR and/or ?to=USD&products=1,2,3
+    (product prices are stored in CurrencyConverter.PRICE_CURRENCY).
+    The ETag is the rate snapshot version, so re-pricing a page costs one
+    request and repeated switches revalidate with a 304.
+    """
+    # Devise du visiteur résolue seulement sans `to` (lecture de session et cookie)
+    to_currency = request.GET.get('to') or request.currency.code
+    from_currency = request.GET.get('from', CurrencyConverter.PRICE_CURRENCY)
+    try:
+        amounts = _parse_list(request.GET.get('amounts'), _parse_amount)
+        product_ids = _parse_list(request.GET.get('products'), int)
+    except (ArithmeticError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Montants ou produits invalides'}, status=400)
+    if len(amounts) + len(product_ids) > MAX_BATCH_CONVERSIONS:
+        return JsonResponse({
+            'success': False,
+            'error': f'{MAX_BATCH_CONVERSIONS} conversions au maximum par requête'
+        }, status=400)
+
+    matrix = exchange_rates.get_matrix()
+    prices = dict(
+        Product.objects.filter(pk__in=product_ids, is_active=True).values_list('pk', 'effective_price')
+    ) if product_ids else {}
+    try:
+        converted_amounts = CurrencyConverter.convert_prices(amounts, from_currency, to_currency, matrix)
+        converted_products = CurrencyConverter.convert_prices(
+            prices.values(), CurrencyConverter.PRICE_CURRENCY, to_currency, matrix
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except ArithmeticError:
+        return JsonResponse({'success': False, 'error': 'Montants invalides'}, status=400)
+
+    def serialize(result):
+        return {'amount': str(result['amount']), 'formatted': result['formatted']}
+
+    response = JsonResponse({
+        'success': True,
+        'data': {
+            'code': to_currency,
+            'symbol': CurrencyConverter.SUPPORTED_CURRENCIES.get(to_currency, {}).get('symbol', to_currency),
+            'version': matrix.version,
+            'stale': matrix.stale,
+            'amounts': [serialize(result) for result in converted_amounts],
+            'products': {str(pk): serialize(result) for pk, result in zip(prices, converted_products)},
+        }
+    })
+    response['ETag'] = quote_etag(rates_etag(matrix, to_currency, with_catalog=bool(product_ids)))
+    return response
+
+
 @login_required
 def account_view(request):
     """Vue de la page de profil avec gestion des devises"""
-    user_currency = get_user_currency(request.user)
+    user_currency = request.currency.code
     
     # Récupérer les informations sur toutes les devises
     currencies = []
@@ -532,13 +764,10 @@ def account_view(request):
 # Context processor pour rendre la devise disponible dans tous les templates
 def currency_context(request):
     """Ajoute les informations de devise au contexte global"""
-    user_currency = 'XOF'
-    
-    if request.user.is_authenticated:
-        user_currency = get_user_currency(request.user)
-    
+    currency = get_request_currency(request)
     return {
-        'user_currency': user_currency,
+        # Paresseux : résolu seulement si le template l'affiche
+        'user_currency': SimpleLazyObject(lambda: currency.code),
         'currencies': CurrencyConverter.SUPPORTED_CURRENCIES,
         'currency_converter': CurrencyConverter
     }
@@ -29,7 +29,9 @@ function addToCart(productId, quantity, buttonElement) {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
-            'X-CSRFToken': csrftoken
+            'X-CSRFToken': csrftoken,
+            // One key per click: a network retry of the same click is replayed, not re-applied
+            'Idempotency-Key': newIdempotencyKey()
         },
         body: JSON.stringify({
             product_id: productId,
@@ -64,6 +66,36 @@ function addToCart(productId, quantity, buttonElement) {
     });
 }
 
+// Apply several cart operations in one request, e.g.
+// updateCart([{op: 'add', product_id: 3, quantity: 2}, {op: 'remove', product_id: 7}])
+function updateCart(operations) {
+    return fetch('/api/cart/batch/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Idempotency-Key': newIdempotencyKey()
+        },
+        body: JSON.stringify({operations: operations})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            document.querySelectorAll('.cart-count').forEach(element => {
+                element.textContent = data.cart_count;
+            });
+        }
+        return data;
+    });
+}
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
 function getCookie(name) {
     let cookieValue = null;
     if (document.cookie && document.cookie !== '') {
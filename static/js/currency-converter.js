@@ -4,9 +4,10 @@
 class CurrencyManager {
     constructor() {
         this.config = {
-            'XOF': { symbol: 'FCFA', flag: '🇹🇬', name: 'Franc CFA' },
-            'USD': { symbol: '$', flag: '🇺🇸', name: 'Dollar américain' },
-            'EUR': { symbol: '€', flag: '🇪🇺', name: 'Euro' }
+            // Same display rules as core/price_format.py
+            'XOF': { symbol: 'FCFA', flag: '🇹🇬', name: 'Franc CFA', locale: 'fr-FR', decimals: 0, symbolFirst: false },
+            'USD': { symbol: '$', flag: '🇺🇸', name: 'Dollar américain', locale: 'en-US', decimals: 2, symbolFirst: true },
+            'EUR': { symbol: '€', flag: '🇪🇺', name: 'Euro', locale: 'fr-FR', decimals: 2, symbolFirst: false }
         };
         
         this.currentCurrency = this.getUserCurrency();
@@ -98,35 +99,64 @@ class CurrencyManager {
     // Format price with currency symbol
     formatPrice(amount, currencyCode) {
         const config = this.config[currencyCode];
-        if (!config) return `${amount.toFixed(2)} ${currencyCode}`;
+        if (!config) return `${amount.toFixed(2)}\u00a0${currencyCode}`;
         
-        const formatted = amount.toFixed(2).replace(/\B(?=(\d{3})+(?!\d))/g, ',');
-        return `${config.symbol} ${formatted}`;
+        this.numberFormats = this.numberFormats || {};
+        const numberFormat = this.numberFormats[currencyCode] = this.numberFormats[currencyCode] ||
+            new Intl.NumberFormat(config.locale, {
+                minimumFractionDigits: config.decimals,
+                maximumFractionDigits: config.decimals
+            });
+        const formatted = numberFormat.format(Math.abs(amount));
+        const sign = amount < 0 ? '-' : '';
+        return config.symbolFirst
+            ? `${sign}${config.symbol}${formatted}`
+            : `${sign}${formatted}\u00a0${config.symbol}`;
     }
     
-    // Convert all prices on the page
+    // Convert all prices on the page: one batch request per base currency
     async convertAllPrices() {
-        await this.fetchExchangeRates();
-        
-        const priceElements = document.querySelectorAll('.currency-price');
-        
-        priceElements.forEach(element => {
+        const groups = {};
+        document.querySelectorAll('.currency-price').forEach(element => {
             const baseAmount = parseFloat(element.dataset.baseAmount);
+            if (isNaN(baseAmount)) return;
             const baseCurrency = element.dataset.baseCurrency || 'EUR';
-            
-            if (!isNaN(baseAmount)) {
-                element.classList.add('loading');
-                
-                const convertedAmount = this.convert(
-                    baseAmount, 
-                    baseCurrency, 
-                    this.currentCurrency
-                );
-                
-                element.textContent = this.formatPrice(convertedAmount, this.currentCurrency);
-                element.classList.remove('loading');
-            }
+            (groups[baseCurrency] = groups[baseCurrency] || []).push({ element, baseAmount });
+            element.classList.add('loading');
+        });
+        
+        await Promise.all(Object.entries(groups).map(([baseCurrency, items]) =>
+            this.convertGroup(baseCurrency, items)
+        ));
+    }
+    
+    // Convert prices sharing a base currency with /api/convert-prices/
+    // (same rate snapshot for every amount, revalidated through its ETag)
+    async convertGroup(baseCurrency, items) {
+        const params = new URLSearchParams({
+            from: baseCurrency,
+            to: this.currentCurrency,
+            amounts: items.map(item => item.baseAmount).join(',')
         });
+        
+        try {
+            const response = await fetch(`/api/convert-prices/?${params}`, { cache: 'no-cache' });
+            const data = await response.json();
+            if (!data.success) throw new Error(data.error);
+            
+            items.forEach((item, index) => {
+                item.element.textContent = data.data.amounts[index].formatted;
+            });
+        } catch (error) {
+            console.error('Batch conversion failed, converting locally:', error);
+            await this.fetchExchangeRates();
+            items.forEach(item => {
+                const convertedAmount = this.convert(item.baseAmount, baseCurrency, this.currentCurrency);
+                item.element.textContent = this.formatPrice(convertedAmount, this.currentCurrency);
+            });
+        } finally {
+            items.forEach(item => item.element.classList.remove('loading'));
+        }
     }
     
     // Setup event listeners
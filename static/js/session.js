@@ -0,0 +1,23 @@
+// Session fragments - Fill in the per-visitor parts of cached pages
+
+document.addEventListener('DOMContentLoaded', function() {
+    fetch('/api/session-fragment/', {credentials: 'same-origin'})
+    .then(response => response.json())
+    .then(data => {
+        // Cart count in the navbar
+        document.querySelectorAll('.cart-count').forEach(element => {
+            element.textContent = data.cart_count;
+        });
+
+        // Cached pages carry another visitor's CSRF token
+        document.querySelectorAll('input[name=csrfmiddlewaretoken]').forEach(input => {
+            input.value = data.csrf_token;
+        });
+
+        document.body.dataset.currency = data.currency;
+        document.dispatchEvent(new CustomEvent('session:loaded', {detail: data}));
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+});